@@ -1,72 +1,77 @@
 # app.py
 import streamlit as st
-import zipfile
-from io import BytesIO
-import pandas as pd
-from pathlib import Path
-from chart_functions import (desired_wfh_days, 
-                             employer_vs_employee_wfh, wfh_benefits_challenges, 
-                             productivity_trends, industry_efficiency, 
-                             regional_preferences, wfo_reactions, commute_satisfaction
-                             )
+from data_functions import filters, memory, pipeline, profiling, sampling, warmup
+from data_functions.loader import dataset_fingerprint
+from chart_functions import registry
 
 # Set wide layout at the start
 st.set_page_config(layout="wide")
 
-@st.cache_data
-def load_data():
-    try:
-        # Get the directory where app.py is located
-        current_dir = Path(__file__).parent
-        
-        # Construct path to the zip file
-        zip_path = current_dir / "data" / "WFHdata_October24_minimal.zip"
-        
-        # st.write(f"Attempting to read from: {zip_path}")  # Debug info
-        
-        # Check if file exists
-        if not zip_path.exists():
-            st.error(f"Zip file not found at {zip_path}")
-            return None
+# Get the chart parameter from URL
+chart_type = st.query_params.get("chart", registry.DEFAULT_ROUTE)
 
-        # Read the zip file
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            # List all files in zip for debugging
-            # st.write(f"Files in zip: {zip_ref.namelist()}")  # Debug info
-            
-            # Get the CSV filename (assuming it's the only or first CSV)
-            csv_name = next(name for name in zip_ref.namelist() if name.endswith('.csv'))
-            
-            with zip_ref.open(csv_name) as csv_file:
-                df = pd.read_csv(csv_file, low_memory=False)
-                
-                # Convert date string to datetime
-                df["date_proper"] = pd.to_datetime(df["date"].str.replace("m", "-"), format="%Y-%m")
-                return df
+# ?profile=1 times each stage of this rerun and shows the breakdown below the chart
+if profiling.requested():
+    profiling.start(route=chart_type)
 
-    except Exception as e:
-        st.error(f"Error loading data: {str(e)}")
-        return None
+# Import only the selected chart's module
+chart = registry.get_chart(chart_type)
 
-df = load_data()
+# serve.py starts preparing the data at boot; under plain `streamlit run` the first
+# page view starts it. Until the data is in memory the page shows a placeholder.
+warmup.start()
+if not warmup.ready():
+    with st.spinner("Loading survey data..."):
+        warmup.wait()
 
-# Get the chart parameter from URL
-chart_type = st.query_params.get("chart", "home")
+# Over WFH_MEMORY_BUDGET_MB, evict caches before this rerun adds to them
+memory.enforce_budget()
+
+# Content version of the data for this rerun; a swapped zip or new wave changes it
+fingerprint = dataset_fingerprint()
+
+# Sidebar filters apply to every chart; the mask comes from bitmaps built once per
+# process, the first time anyone actually filters
+with profiling.stage("filters"):
+    options = filters.load_options(fingerprint)
+    filter_state = filters.canonical(options, filters.sidebar(options)) if options is not None else ()
+    index = filters.load_index(fingerprint) if filter_state else None
+    mask = filters.row_mask(index, dict(filter_state)) if index is not None else None
 
-# Update chart selection
-if chart_type == "employer_employee":
-    employer_vs_employee_wfh.show_chart(df)
-elif chart_type == "benefits_challenges":
-    wfh_benefits_challenges.show_chart(df)
-elif chart_type == "productivity":
-    productivity_trends.show_chart(df)
-elif chart_type == "industry":
-    industry_efficiency.show_chart(df)
-elif chart_type == "regional":
-    regional_preferences.show_chart(df)
-elif chart_type == "reactions":
-    wfo_reactions.show_chart(df)
-elif chart_type == "commute":
-    commute_satisfaction.show_chart(df)
+if mask is not None and not mask.any():
+    st.info("No responses match the selected filters.")
 else:
-    desired_wfh_days.show_chart(df)
\ No newline at end of file
+    # The chart and its metrics render into one slot, so the exact version replaces
+    # the approximate one in place; the "approximate" marker has a slot of its own
+    # to keep both renders laid out the same
+    note = st.empty()
+    slot = st.empty()
+
+    # WFH_PROGRESSIVE=1: when the exact tables are slow to get (columns not loaded
+    # yet, or a very large selection), paint the view from the stratified sample first
+    approximate = None
+    if pipeline.needs_refinement(chart, filter_state, mask, fingerprint):
+        with profiling.stage("sample_tables"):
+            approximate = pipeline.sample_tables(chart, filter_state, mask, fingerprint)
+        if approximate is not None:
+            note.caption(
+                f"≈ Approximate: estimated from a {sampling.SAMPLE_FRACTION:.0%} sample "
+                "stratified by month and region. Computing exact figures..."
+            )
+            with profiling.stage("render_approximate"), slot.container():
+                chart.render(approximate)
+
+    # Popular slices are aggregated once per process and shared by every session
+    with profiling.stage("tables"):
+        tables = pipeline.chart_tables(chart, filter_state, mask, fingerprint)
+    if tables is not None:
+        if approximate is not None:
+            note.empty()
+        with profiling.stage("render"), slot.container():
+            chart.render(tables)
+
+# With ?profile=1, also attribute the process's memory to the caches holding it
+if profiling.requested():
+    memory.show_accounting(index)
+
+profiling.finish(filters=filter_state)
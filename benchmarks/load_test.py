@@ -0,0 +1,224 @@
+# benchmarks/load_test.py
+# Load-tests the app locally: starts the server on localhost and has N concurrent
+# simulated browser sessions load a mix of ?chart= routes over Streamlit's websocket
+# protocol, the way the frontend does. Nothing leaves the machine.
+#
+#   python benchmarks/load_test.py --sessions 20 --duration 60
+#   python benchmarks/load_test.py --sessions 5 --routes home regional --output /tmp/load.json
+#
+# Reports p50/p95/p99 time to the first chart element, throughput in page views
+# per second and the server's RSS sampled over the run.
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from tornado.websocket import websocket_connect
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_PATH = Path(__file__).resolve().parent / "load_results.json"
+
+sys.path.insert(0, str(ROOT))
+from chart_functions.registry import CHARTS
+
+ROUTES = list(CHARTS)
+PERCENTILES = [50, 95, 99]
+
+
+def start_server(port, log):
+    # serve.py so the run sees the same warm-up as production; telemetry stays off
+    return subprocess.Popen(
+        [sys.executable, str(ROOT / "serve.py"),
+         "--server.port", str(port),
+         "--server.address", "127.0.0.1",
+         "--server.headless", "true",
+         "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        cwd=ROOT, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def wait_healthy(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.read() == b"ok":
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server did not become healthy within {timeout}s")
+
+
+def rss_mb(pid):
+    # Resident set size from /proc (Linux); None where that is not available
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+async def sample_rss(pid, interval, started, samples, stop):
+    while not stop.is_set():
+        samples.append({"t": round(time.perf_counter() - started, 2), "rss_mb": rss_mb(pid)})
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def page_view(port, route, timeout):
+    # One page load: open a session, ask for a script run with ?chart=<route> and read
+    # ForwardMsgs until the first Plotly chart element and then the end of the run
+    connection = await websocket_connect(
+        f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"]
+    )
+    try:
+        message = BackMsg()
+        message.rerun_script.query_string = f"chart={route}"
+        started = time.perf_counter()
+        await connection.write_message(message.SerializeToString(), binary=True)
+
+        to_chart = None
+        error = None
+        deadline = started + timeout
+        while True:
+            data = await asyncio.wait_for(connection.read_message(), max(deadline - time.perf_counter(), 0))
+            if data is None:
+                raise ConnectionError("server closed the session")
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element.WhichOneof("type")
+                if element == "plotly_chart" and to_chart is None:
+                    to_chart = time.perf_counter() - started
+                elif element == "exception":
+                    error = forward.delta.new_element.exception.message
+            elif kind == "script_finished":
+                break
+        return {
+            "route": route,
+            "time_to_chart_s": to_chart,
+            "time_to_finish_s": time.perf_counter() - started,
+            "error": error or (None if to_chart is not None else "no chart rendered"),
+        }
+    finally:
+        connection.close()
+
+
+async def session(port, routes, deadline, timeout, views):
+    # A simulated viewer loading one page after another until the run ends
+    for route in routes:
+        if time.perf_counter() >= deadline:
+            return
+        try:
+            views.append(await page_view(port, route, timeout))
+        except (OSError, asyncio.TimeoutError, ConnectionError) as e:
+            views.append({"route": route, "time_to_chart_s": None, "time_to_finish_s": None,
+                          "error": f"{type(e).__name__}: {e}"})
+
+
+def percentiles(values):
+    if not values:
+        return {f"p{p}": None for p in PERCENTILES}
+    return {f"p{p}": round(float(v), 4) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def summarize(views, elapsed, samples):
+    ok = [view for view in views if view["error"] is None]
+    by_route = {}
+    for route in sorted({view["route"] for view in views}):
+        times = [view["time_to_chart_s"] for view in ok if view["route"] == route]
+        by_route[route] = {"views": len(times), **percentiles(times)}
+    rss = [sample["rss_mb"] for sample in samples if sample["rss_mb"] is not None]
+    return {
+        "views": len(views),
+        "errors": len(views) - len(ok),
+        "elapsed_s": round(elapsed, 2),
+        "throughput_views_per_s": round(len(ok) / elapsed, 2) if elapsed else None,
+        "time_to_chart_s": percentiles([view["time_to_chart_s"] for view in ok]),
+        "time_to_finish_s": percentiles([view["time_to_finish_s"] for view in ok]),
+        "routes": by_route,
+        "peak_rss_mb": round(max(rss), 1) if rss else None,
+    }
+
+
+async def run_load(port, server_pid, sessions, routes, duration, timeout, sample_interval):
+    views = []
+    samples = []
+    stop = asyncio.Event()
+    started = time.perf_counter()
+    sampler = asyncio.create_task(sample_rss(server_pid, sample_interval, started, samples, stop))
+
+    # Each session walks the route mix from a different starting point, so all routes
+    # are requested concurrently from the first second
+    deadline = started + duration
+    await asyncio.gather(*(
+        session(port, itertools.islice(itertools.cycle(routes), i, None), deadline, timeout, views)
+        for i in range(sessions)
+    ))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler
+    return summarize(views, elapsed, samples), views, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test app.py with concurrent simulated sessions")
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent simulated viewers")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep loading pages")
+    parser.add_argument("--routes", nargs="+", default=ROUTES, choices=ROUTES)
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per page view")
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="seconds between RSS samples")
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    args = parser.parse_args()
+
+    log_path = args.output.with_suffix(".server.log")
+    with open(log_path, "w") as log:
+        server = start_server(args.port, log)
+        try:
+            wait_healthy(args.port, args.startup_timeout)
+            summary, views, samples = asyncio.run(run_load(
+                args.port, server.pid, args.sessions, args.routes,
+                args.duration, args.timeout, args.sample_interval,
+            ))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    results = {
+        "settings": {
+            "sessions": args.sessions,
+            "duration_s": args.duration,
+            "routes": args.routes,
+            "env": {k: v for k, v in os.environ.items() if k.startswith("WFH_")},
+        },
+        "summary": summary,
+        "rss": samples,
+        "views": views,
+    }
+    args.output.write_text(json.dumps(results, indent=2))
+    print(json.dumps(summary, indent=2))
+    print(f"Wrote {args.output} (server log in {log_path})", file=sys.stderr)
+    sys.exit(1 if summary["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# benchmarks/run_benchmarks.py
+# Times every ?chart= route of app.py headlessly with Streamlit's AppTest.
+#
+#   python benchmarks/run_benchmarks.py                        # write benchmarks/results.json
+#   python benchmarks/run_benchmarks.py --save-baseline        # also store it as the baseline
+#   python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+#
+# Each route runs in a fresh interpreter, so the first run is a real cold start
+# (imports, data load, empty caches) and the following runs are warm reruns.
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = ROOT / "app.py"
+RESULTS_PATH = Path(__file__).resolve().parent / "results.json"
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+sys.path.insert(0, str(ROOT))
+from chart_functions.registry import CHARTS
+
+ROUTES = list(CHARTS)
+
+# Metrics compared against the baseline; all of them are "lower is better"
+COMPARED_METRICS = ["cold_s", "warm_median_s", "peak_rss_mb", "figure_bytes"]
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_route(route, warm_runs, timeout):
+    # Runs inside the worker interpreter and returns one route's measurements
+    from streamlit.testing.v1 import AppTest
+
+    def run_once():
+        at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+        at.query_params["chart"] = route
+        start = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(f"{route}: {at.exception[0].value}")
+        return at, elapsed
+
+    rss_before = peak_rss_mb()
+    at, cold = run_once()
+    cold_peak = peak_rss_mb()
+    warm = [run_once()[1] for _ in range(warm_runs)]
+
+    return {
+        "cold_s": round(cold, 4),
+        "warm_median_s": round(statistics.median(warm), 4) if warm else None,
+        "warm_min_s": round(min(warm), 4) if warm else None,
+        "rss_before_mb": round(rss_before, 1),
+        "peak_rss_mb": round(max(cold_peak, peak_rss_mb()), 1),
+        "figure_bytes": sum(len(chart.proto.spec) for chart in at.get("plotly_chart")),
+        "metrics": len(at.metric),
+    }
+
+
+def run_worker(route, warm_runs, timeout):
+    result = run_route(route, warm_runs, timeout)
+    json.dump(result, sys.stdout)
+
+
+def run_suite(routes, warm_runs, timeout):
+    results = {}
+    for route in routes:
+        # A fresh interpreter per route keeps cold starts cold and memory figures separate
+        completed = subprocess.run(
+            [sys.executable, __file__, "--worker", route,
+             "--warm-runs", str(warm_runs), "--timeout", str(timeout)],
+            capture_output=True, text=True, cwd=ROOT,
+        )
+        if completed.returncode != 0:
+            results[route] = {"error": completed.stderr.strip().splitlines()[-1:]}
+        else:
+            results[route] = json.loads(completed.stdout.strip().splitlines()[-1])
+        print(f"{route:22s} {results[route]}", file=sys.stderr)
+    return results
+
+
+def environment():
+    # Settings that change what is being measured are recorded with the numbers
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=ROOT
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "env": {k: v for k, v in os.environ.items() if k.startswith("WFH_")},
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Returns the (route, metric, baseline, current) entries that got worse than tolerance allows
+    regressions = []
+    for route, current in results["routes"].items():
+        previous = baseline["routes"].get(route)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append((route, metric, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every ?chart= route of app.py")
+    parser.add_argument("--routes", nargs="+", default=ROUTES)
+    parser.add_argument("--warm-runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.warm_runs, args.timeout)
+        return
+
+    # A cold start measures one route on its own unless warm-up is asked for explicitly
+    os.environ.setdefault("WFH_WARMUP", "off")
+
+    results = {
+        "environment": environment(),
+        "routes": run_suite(args.routes, args.warm_runs, args.timeout),
+    }
+    args.output.write_text(json.dumps(results, indent=2))
+    print(f"Wrote {args.output}", file=sys.stderr)
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(results, indent=2))
+        print(f"Saved baseline {BASELINE_PATH}", file=sys.stderr)
+
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text()), args.tolerance)
+        for route, metric, old, new in regressions:
+            print(f"REGRESSION {route} {metric}: {old} -> {new}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# build_aggregates.py
+# Materializes every chart's aggregate tables next to the survey zip:
+#   python build_aggregates.py
+# Survey waves dropped in data/ as WFHdata_wave_*.csv (or .zip) are folded into an
+# existing artifact without reprocessing the months already in it.
+# Run the app with WFH_DATA_MODE=aggregates to render from them.
+#   python build_aggregates.py --chunked [--chunk-mb 64]
+# streams the zip and waves in bounded chunks instead of loading the whole survey,
+# for exports larger than memory.
+import argparse
+import itertools
+
+from data_functions import aggregates, parquet_store, schema
+from data_functions.loader import ZIP_PATH, building
+
+
+def build_chunked(charts, out_dir, chunk_bytes):
+    # Never materializes the survey: each chunk is aggregated and dropped
+    waves = [(path, parquet_store.source_fingerprint(path)) for path in parquet_store.wave_files(ZIP_PATH)]
+    chunks = itertools.chain(
+        parquet_store.iter_csv_chunks(ZIP_PATH, chunk_bytes),
+        *(parquet_store.iter_csv_chunks(path, chunk_bytes) for path, _ in waves),
+    )
+    return aggregates.build_aggregates(
+        charts, chunks, ZIP_PATH, out_dir, waves={path.name: fingerprint for path, fingerprint in waves}
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the chart aggregate tables next to the survey zip")
+    parser.add_argument("--chunked", action="store_true", help="aggregate the CSV in bounded chunks")
+    parser.add_argument("--chunk-mb", type=int, default=64, help="CSV text per chunk in --chunked mode")
+    args = parser.parse_args()
+
+    charts = aggregates.artifact_charts()
+    out_dir = aggregates.aggregates_path(ZIP_PATH)
+
+    # A running app may be building the store or folding waves into the same files
+    with building():
+        if args.chunked:
+            out_dir = build_chunked(charts, out_dir, args.chunk_mb << 20)
+            print(f"Built {out_dir}")
+            return
+
+        # Up to date apart from new survey waves: parse and fold in just those
+        if not aggregates.is_stale(ZIP_PATH, out_dir):
+            waves = aggregates.pending_waves(ZIP_PATH, out_dir)
+            aggregates.fold_waves(charts, ZIP_PATH, out_dir)
+            print(f"Folded {len(waves)} new wave(s) into {out_dir}")
+            return
+
+        store_dir = parquet_store.ensure_store(ZIP_PATH)
+        df = parquet_store.read_store(store_dir)
+        df["date_proper"] = schema.decode_dates(df["date"])
+
+        waves = parquet_store.read_manifest(store_dir).get("waves", {})
+        out_dir = aggregates.build_aggregates(charts, [df], ZIP_PATH, out_dir, waves=waves)
+        print(f"Built {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
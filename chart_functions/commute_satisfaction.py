@@ -1,36 +1,76 @@
 # chart_functions/commute_satisfaction.py
 import streamlit as st
 import plotly.express as px
-import pandas as pd
 import numpy as np
+from chart_functions.precomputed_box import box_figure
+from data_functions import schema
+from data_functions.aggregates import expand_counts, precomputed_boxes
+from data_functions.derived import derived_column
+from chart_functions.metrics import show_metrics
+from data_functions.figure_cache import cached_figure
+from data_functions.profiling import stage
+
+# Survey columns this chart reads
+COLUMNS = ["commutetime_quant", "wfh_feel_quant"]
+
+# Key columns of each aggregate table; everything else is a count or sum that adds up
+TABLE_KEYS = {"counts": ["commute_time_category", "wfh_feel_quant"]}
+
+# Box order and colour of each bucket as the chart has always drawn them: px.box took
+# the buckets in the order they first appear in the survey export, with the missing
+# (unbucketed) commutes third, so Medium got Set2's fourth colour
+CATEGORY_ORDER = [schema.COMMUTE_LABELS[0], schema.COMMUTE_LABELS[2], schema.COMMUTE_LABELS[1]]
+COLORS = [px.colors.qualitative.Set2[i] for i in (0, 1, 3)]
+
+@derived_column
+def commute_time_category(df):
+    # Create commute categories (bins live in the schema so the sidebar filter uses the same ones)
+    return schema.commute_buckets(df["commutetime_quant"])
+
+def aggregate(df):
+    # Number of respondents per commute category and pay trade-off answer
+    counts = df.groupby(
+        [commute_time_category(df), df["wfh_feel_quant"]], observed=True
+    ).size().reset_index(name="count")
+    return {"counts": counts}
 
 def show_chart(df):
-    # Define commute time bins
-    bins = [0, 30, 60, 120]  # Define ranges for small, medium, and large commute times
-    labels = ["Small (0-30 min)", "Medium (31-60 min)", "Large (61+ min)"]
-    
-    # Create commute categories
-    df["commute_time_category"] = pd.cut(
-        df["commutetime_quant"], 
-        bins=bins, 
-        labels=labels, 
-        right=False
-    )
-    
+    render(aggregate(df))
+
+def build_figure(tables):
+    counts = tables["counts"]
+
+    title = "WFH Value by Commute Time: Pay Trade-off Analysis"
+    labels = {
+        "commute_time_category": "Daily Commute Duration",
+        "wfh_feel_quant": "Acceptable Pay Change for WFH (%)"
+    }
+
     # Create enhanced boxplot
-    fig = px.box(
-        df,
-        x="commute_time_category",
-        y="wfh_feel_quant",
-        title="WFH Value by Commute Time: Pay Trade-off Analysis",
-        labels={
-            "commute_time_category": "Daily Commute Duration",
-            "wfh_feel_quant": "Acceptable Pay Change for WFH (%)"
-        },
-        color="commute_time_category",
-        color_discrete_sequence=px.colors.qualitative.Set2,
-        notched=True  # Add notches for better statistical comparison
-    )
+    if precomputed_boxes():
+        # Quartiles, fences and notches computed here; the browser only gets a few numbers per bucket
+        fig = box_figure(
+            counts,
+            x="commute_time_category",
+            y="wfh_feel_quant",
+            title=title,
+            labels=labels,
+            colors=COLORS,
+            category_order=CATEGORY_ORDER,
+            notched=True  # Add notches for better statistical comparison
+        )
+    else:
+        fig = px.box(
+            expand_counts(counts),
+            x="commute_time_category",
+            y="wfh_feel_quant",
+            title=title,
+            labels=labels,
+            category_orders={"commute_time_category": CATEGORY_ORDER},
+            color="commute_time_category",
+            color_discrete_sequence=COLORS,
+            notched=True  # Add notches for better statistical comparison
+        )
 
     # Enhance the layout
     fig.update_layout(
@@ -66,8 +106,18 @@ def show_chart(df):
         tickfont=dict(size=12)
     )
 
+    return fig
+
+def metrics(tables):
+    # No summary metrics under this chart yet (see the draft below)
+    return []
+
+def render(tables):
     # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
+    fig = cached_figure(__name__, tables, build_figure)
+    with stage("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+    show_metrics(metrics(tables))
 
     # # Calculate and display key metrics
     # col1, col2, col3 = st.columns(3)
@@ -1,26 +1,58 @@
 # chart_functions/desired_wfh_days.py
 import streamlit as st
-import plotly.express as px
 import plotly.graph_objects as go
+import numpy as np
+from chart_functions.metrics import metric, show_metrics
+from data_functions.figure_cache import cached_figure
+from data_functions.profiling import stage
+
+# Survey columns this chart reads
+COLUMNS = ["wfh_days_postCOVID_ss"]
+
+# Key columns of each aggregate table; everything else is a count or sum that adds up
+TABLE_KEYS = {"counts": ["wfh_days_postCOVID_ss"]}
+
+def aggregate(df):
+    # Number of respondents per desired WFH day count
+    counts = df["wfh_days_postCOVID_ss"].value_counts(dropna=False).sort_index()
+    return {"counts": counts.rename_axis("wfh_days_postCOVID_ss").reset_index(name="count")}
+
+def show_chart(df):
+    render(aggregate(df))
+
+def bin_counts(answered):
+    # One bin per whole day, matching the bins Plotly picked in the browser for nbins=6
+    days = answered["wfh_days_postCOVID_ss"].to_numpy(dtype=float)
+    if len(days) == 0:
+        return np.array([]), np.array([])
+    edges = np.arange(days.min() - 0.5, days.max() + 1)
+    heights, edges = np.histogram(days, bins=edges, weights=answered["count"])
+    return (edges[:-1] + edges[1:]) / 2, heights
+
+def mean_days(answered):
+    return (answered["wfh_days_postCOVID_ss"] * answered["count"]).sum() / answered["count"].sum()
+
+def build_figure(tables):
+    answered = tables["counts"].dropna(subset=["wfh_days_postCOVID_ss"])
+
+    # Bin on the server so the figure carries one bar per bin instead of every response
+    bin_centers, bin_heights = bin_counts(answered)
 
-def show_chart(df):    
     # Create the enhanced histogram
-    fig = px.histogram(
-        df,
-        x="wfh_days_postCOVID_ss",
-        nbins=6,  # Set number of bins to match days of the week
-        title="Distribution of Desired WFH Days (Post-COVID)",
-        labels={
-            "wfh_days_postCOVID_ss": "Desired WFH Days per Week",
-            "count": "Number of Responses"
-        },
-        color_discrete_sequence=["#1f77b4"],  # Professional blue color
+    fig = go.Figure(
+        go.Bar(
+            x=bin_centers,
+            y=bin_heights,
+            marker_color="#1f77b4",  # Professional blue color
+            hovertemplate="Desired WFH Days per Week=%{x}<br>count=%{y}<extra></extra>",
+        )
     )
 
     # Enhance the layout
     fig.update_layout(
         plot_bgcolor="white",
         title={
+            'text': "Distribution of Desired WFH Days (Post-COVID)",
             'y':0.95,
             'x':0.5,
             'xanchor': 'center',
@@ -41,11 +73,13 @@ def show_chart(df):
         gridcolor='lightgrey',
         griddash='dash',
         title_font=dict(size=14),
-        tickfont=dict(size=12)
+        tickfont=dict(size=12),
+        title_text="count"
     )
 
     # Enhance x-axis
     fig.update_xaxes(
+        title_text="Desired WFH Days per Week",
         title_font=dict(size=14),
         tickfont=dict(size=12),
         tickmode='linear',
@@ -54,7 +88,7 @@ def show_chart(df):
     )
 
     # Add mean line and annotation
-    mean_value = df["wfh_days_postCOVID_ss"].mean()
+    mean_value = mean_days(answered)
     fig.add_vline(
         x=mean_value,
         line_dash="dash",
@@ -62,15 +96,25 @@ def show_chart(df):
         annotation_text=f"Mean: {mean_value:.1f} days",
         annotation_position="top"
     )
+    return fig
+
+def metrics(tables):
+    counts = tables["counts"]
+    answered = counts.dropna(subset=["wfh_days_postCOVID_ss"])
+    mean_value = mean_days(answered)
+
+    # Key statistics
+    return [
+        metric("Average Desired WFH Days", f"{mean_value:.1f}"),
+        metric("Most Common Choice", f"{answered.loc[answered['count'].idxmax(), 'wfh_days_postCOVID_ss']:.0f} days"),
+        metric("Total Responses", f"{counts['count'].sum():,}"),
+    ]
 
+def render(tables):
     # Add insights below the chart
-    st.plotly_chart(fig, use_container_width=True)
+    fig = cached_figure(__name__, tables, build_figure)
+    with stage("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
     
     # Display key statistics
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric("Average Desired WFH Days", f"{mean_value:.1f}")
-    with col2:
-        st.metric("Most Common Choice", f"{df['wfh_days_postCOVID_ss'].mode().iloc[0]:.0f} days")
-    with col3:
-        st.metric("Total Responses", f"{len(df):,}")
\ No newline at end of file
+    show_metrics(metrics(tables))
\ No newline at end of file
@@ -2,13 +2,54 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from data_functions import bootstrap
+from chart_functions.metrics import interval_text, metric, show_metrics
+from data_functions.counting import count_by
+from data_functions.figure_cache import cached_figure
+from data_functions.profiling import stage
+
+# Survey columns this chart reads
+COLUMNS = ["wfh_days_postCOVID_ss", "wfh_days_postCOVID_boss_ss"]
+
+# Key columns of each aggregate table; everything else is a count or sum that adds up
+TABLE_KEYS = {
+    "counts": ["wfh_days_postCOVID_ss", "wfh_days_postCOVID_boss_ss"],
+    "summary": [],
+    "pairs": ["wfh_days_postCOVID_ss", "wfh_days_postCOVID_boss_ss"]
+}
+
+def aggregate(df):
+    # Respondents per (employee, employer) answer pair in a single pass; unanswered
+    # questions keep a row of their own so the metric totals come from the same table
+    pairs = count_by(
+        [df["wfh_days_postCOVID_ss"], df["wfh_days_postCOVID_boss_ss"]], dropna=False, name="counts"
+    )
+    employee = pairs["wfh_days_postCOVID_ss"]
+    employer = pairs["wfh_days_postCOVID_boss_ss"]
+    counts = pairs["counts"]
+
+    # Totals behind the alignment metrics
+    summary = pd.DataFrame([{
+        "respondents": counts.sum(),
+        "aligned": counts[employee == employer].sum(),
+        "employee_days": (employee * counts).sum(),
+        "employee_responses": counts[employee.notna()].sum(),
+        "employer_days": (employer * counts).sum(),
+        "employer_responses": counts[employer.notna()].sum(),
+    }])
+
+    # The chart only plots pairs where both answered
+    df_grouped = pairs.dropna().reset_index(drop=True)
+
+    # Every answer pair, unanswered included, for resampling the respondents
+    return {"counts": df_grouped, "summary": summary, "pairs": pairs}
 
 def show_chart(df):
-    # Group and prepare the data
-    df_grouped = df.groupby(
-        ["wfh_days_postCOVID_ss", "wfh_days_postCOVID_boss_ss"]
-    ).size().reset_index(name="counts")
-    
+    render(aggregate(df))
+
+def build_figure(tables):
+    df_grouped = tables["counts"]
+
     # Create enhanced bar chart
     fig = px.bar(
         df_grouped,
@@ -69,33 +110,55 @@ def show_chart(df):
         dtick=1
     )
 
+    return fig
+
+def intervals(tables):
+    # Bootstrap intervals for the alignment rate and the two averages
+    pairs = tables["pairs"]
+    employee = pairs["wfh_days_postCOVID_ss"].to_numpy(dtype=float)
+    employer = pairs["wfh_days_postCOVID_boss_ss"].to_numpy(dtype=float)
+    return bootstrap.intervals(pairs["counts"], {
+        "Perfect Alignment": bootstrap.share(employee == employer),
+        "Avg. Employee Desire": bootstrap.mean(employee),
+        "Avg. Employer Plan": bootstrap.mean(employer),
+    })
+
+def metrics(tables):
+    summary = tables["summary"].iloc[0]
+
     # Calculate alignment metrics
-    perfect_alignment = (df['wfh_days_postCOVID_ss'] == df['wfh_days_postCOVID_boss_ss']).mean() * 100
-    avg_employee_desire = df['wfh_days_postCOVID_ss'].mean()
-    avg_employer_plan = df['wfh_days_postCOVID_boss_ss'].mean()
+    perfect_alignment = summary['aligned'] / summary['respondents'] * 100
+    avg_employee_desire = summary['employee_days'] / summary['employee_responses']
+    avg_employer_plan = summary['employer_days'] / summary['employer_responses']
     difference = avg_employee_desire - avg_employer_plan
 
-    # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
-
-    # Display key metrics
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric(
+    return [
+        metric(
             "Perfect Alignment", 
             f"{perfect_alignment:.1f}%",
-            help="Percentage where employer plans match employee preferences exactly"
-        )
-    with col2:
-        st.metric(
+            help="Percentage where employer plans match employee preferences exactly",
+            interval=interval_text(tables, "Perfect Alignment", lambda share: f"{share:.1%}"),
+        ),
+        metric(
             "Avg. Employee Desire", 
             f"{avg_employee_desire:.1f} days",
             f"{difference:+.1f} days vs employer",
-            help="Average number of WFH days desired by employees"
-        )
-    with col3:
-        st.metric(
+            help="Average number of WFH days desired by employees",
+            interval=interval_text(tables, "Avg. Employee Desire", lambda days: f"{days:.2f} days"),
+        ),
+        metric(
             "Avg. Employer Plan", 
             f"{avg_employer_plan:.1f} days",
-            help="Average number of WFH days planned by employers"
-        )
\ No newline at end of file
+            help="Average number of WFH days planned by employers",
+            interval=interval_text(tables, "Avg. Employer Plan", lambda days: f"{days:.2f} days"),
+        ),
+    ]
+
+def render(tables):
+    # Display the chart
+    fig = cached_figure(__name__, tables, build_figure)
+    with stage("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Display key metrics
+    show_metrics(metrics(tables))
\ No newline at end of file
@@ -2,51 +2,77 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from chart_functions.precomputed_box import box_figure
+from data_functions.aggregates import expand_counts, precomputed_boxes, weighted_median
+from data_functions.derived import derived_column
+from chart_functions.metrics import show_metrics
+from data_functions.figure_cache import cached_figure
+from data_functions.profiling import stage
+from data_functions.schema import INDUSTRY_LABELS
+
+# Survey columns this chart reads
+COLUMNS = ["work_industry", "wfh_eff_COVID_quant"]
+
+# Key columns of each aggregate table; everything else is a count or sum that adds up
+TABLE_KEYS = {"counts": ["work_industry_label", "wfh_eff_COVID_quant"]}
+
+@derived_column
+def work_industry_label(df):
+    # Replace numeric industry codes with labels (relabels the categories only)
+    labels = df["work_industry"].cat.rename_categories(INDUSTRY_LABELS)
+    # In label order, as the string groupby this replaced sorted them: legend order,
+    # colours and the order of tied medians depend on it
+    return labels.cat.reorder_categories(sorted(labels.cat.categories))
+
+def aggregate(df):
+    # Number of respondents per industry and efficiency answer
+    counts = df.groupby(
+        [work_industry_label(df), df["wfh_eff_COVID_quant"]], observed=True
+    ).size().reset_index(name="count")
+    return {"counts": counts}
 
 def show_chart(df):
-    # Industry mapping
-    industry_mapping = {
-        1: "Agriculture",
-        2: "Arts & Entertainment",
-        3: "Finance & Insurance",
-        4: "Construction",
-        5: "Education",
-        6: "Health Care & Social Assistance",
-        7: "Hospitality & Food Services",
-        8: "Information",
-        9: "Manufacturing",
-        10: "Mining",
-        11: "Professional & Business Services",
-        12: "Real Estate",
-        13: "Retail Trade",
-        14: "Transportation and Warehousing",
-        15: "Utilities",
-        16: "Wholesale Trade",
-        17: "Government",
-        18: "Other"
-    }
+    render(aggregate(df))
 
-    # Replace numeric industry codes with labels
-    df["work_industry_label"] = df["work_industry"].map(industry_mapping)
+def build_figure(tables):
+    counts = tables["counts"]
 
     # Calculate median efficiency for sorting
-    industry_medians = df.groupby('work_industry_label')['wfh_eff_COVID_quant'].median().sort_values(ascending=False)
+    industry_medians = counts.groupby('work_industry_label', observed=True).apply(
+        lambda group: weighted_median(group['wfh_eff_COVID_quant'], group['count']),
+        include_groups=False
+    ).sort_values(ascending=False)
     sorted_industries = industry_medians.index.tolist()
 
+    title = "WFH Efficiency Across Industries"
+    labels = {
+        "work_industry_label": "Industry",
+        "wfh_eff_COVID_quant": "Efficiency (%)"
+    }
+
     # Create enhanced boxplot
-    fig = px.box(
-        df,
-        x="work_industry_label",
-        y="wfh_eff_COVID_quant",
-        title="WFH Efficiency Across Industries",
-        labels={
-            "work_industry_label": "Industry",
-            "wfh_eff_COVID_quant": "Efficiency (%)"
-        },
-        category_orders={"work_industry_label": sorted_industries},
-        color="work_industry_label",
-        color_discrete_sequence=px.colors.qualitative.Set3,
-    )
+    if precomputed_boxes():
+        # Quartiles and fences computed here; the browser only gets a few numbers per industry
+        fig = box_figure(
+            counts,
+            x="work_industry_label",
+            y="wfh_eff_COVID_quant",
+            title=title,
+            labels=labels,
+            colors=px.colors.qualitative.Set3,
+            category_order=sorted_industries,
+        )
+    else:
+        fig = px.box(
+            expand_counts(counts),
+            x="work_industry_label",
+            y="wfh_eff_COVID_quant",
+            title=title,
+            labels=labels,
+            category_orders={"work_industry_label": sorted_industries},
+            color="work_industry_label",
+            color_discrete_sequence=px.colors.qualitative.Set3,
+        )
 
     # Enhance the layout
     fig.update_layout(
@@ -83,8 +109,18 @@ def show_chart(df):
         tickangle=45,  # Rotate labels for better readability
     )
 
+    return fig
+
+def metrics(tables):
+    # No summary metrics under this chart yet (see the draft below)
+    return []
+
+def render(tables):
     # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
+    fig = cached_figure(__name__, tables, build_figure)
+    with stage("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+    show_metrics(metrics(tables))
 
     # # Calculate and display key metrics
     # col1, col2, col3 = st.columns(3)
@@ -0,0 +1,28 @@
+# chart_functions/metrics.py
+import streamlit as st
+from data_functions.bootstrap import LEVEL
+
+def metric(label, value, delta=None, help=None, interval=None):
+    # One st.metric's arguments, kept as data so the static export can reuse them
+    return {"label": label, "value": value, "delta": delta, "help": help, "interval": interval}
+
+def interval_text(tables, label, fmt):
+    # "95% CI: low to high" for a metric whose bootstrap interval was computed with
+    # the tables (not for approximate tables or charts without intervals)
+    intervals = tables.get("intervals")
+    if intervals is None:
+        return None
+    row = intervals[intervals["label"] == label]
+    if row.empty:
+        return None
+    return f"{LEVEL:.0%} CI: {fmt(row['low'].iloc[0])} to {fmt(row['high'].iloc[0])}"
+
+def show_metrics(metrics):
+    # One column per metric below the chart, with its confidence interval underneath
+    if not metrics:
+        return
+    for column, item in zip(st.columns(len(metrics)), metrics):
+        with column:
+            st.metric(item["label"], item["value"], item["delta"], help=item["help"])
+            if item.get("interval"):
+                st.caption(item["interval"])
@@ -0,0 +1,55 @@
+# chart_functions/precomputed_box.py
+import plotly.graph_objects as go
+from data_functions.aggregates import box_stats
+
+def box_figure(counts, x, y, title, labels, colors, category_order=None, notched=False):
+    # Same figure px.box draws with color=x, but every box carries its quartiles,
+    # fences and notch instead of the raw observations
+    if category_order is None:
+        category_order = counts[x].drop_duplicates().tolist()
+
+    fig = go.Figure()
+    for i, category in enumerate(category_order):
+        group = counts[counts[x] == category]
+        if group.empty:
+            continue
+        stats = box_stats(group[y], group["count"])
+        color = colors[i % len(colors)]
+
+        fig.add_trace(go.Box(
+            name=str(category),
+            x=[category],
+            q1=[stats["q1"]],
+            median=[stats["median"]],
+            q3=[stats["q3"]],
+            lowerfence=[stats["lowerfence"]],
+            upperfence=[stats["upperfence"]],
+            notchspan=[stats["notchspan"]] if notched else None,
+            notched=notched,
+            boxpoints=False,
+            marker_color=color,
+            legendgroup=str(category),
+            offsetgroup=str(category),
+            alignmentgroup="True",
+        ))
+
+        # Outliers go in a marker trace of their own, drawn where Plotly.js would put them
+        if len(stats["outliers"]):
+            fig.add_trace(go.Scatter(
+                x=[category] * len(stats["outliers"]),
+                y=stats["outliers"],
+                mode="markers",
+                marker_color=color,
+                legendgroup=str(category),
+                showlegend=False,
+                hovertemplate=f"{labels[x]}=%{{x}}<br>{labels[y]}=%{{y}}<extra></extra>",
+            ))
+
+    fig.update_layout(
+        title_text=title,
+        boxmode="overlay",
+        legend_title_text=labels[x],
+        xaxis=dict(title_text=labels[x], categoryorder="array", categoryarray=category_order),
+        yaxis=dict(title_text=labels[y]),
+    )
+    return fig
@@ -2,21 +2,44 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from data_functions.derived import derived_column
+from chart_functions.metrics import show_metrics
+from data_functions.figure_cache import cached_figure
+from data_functions.profiling import stage
 
-def show_chart(df):
-    # Data preparation
+# Survey columns this chart reads (date_proper is decoded from date)
+COLUMNS = ["date", "wfh_days_postCOVID_s", "wfh_eff_COVID_quant"]
+
+# Key columns of each aggregate table; everything else is a count or sum that adds up
+TABLE_KEYS = {"efficiency": ["date_proper", "wfh_days_numeric"]}
+
+@derived_column
+def wfh_days_numeric(df):
     # Convert WFH days to numeric values
-    df["wfh_days_numeric"] = df["wfh_days_postCOVID_s"].replace({
+    return df["wfh_days_postCOVID_s"].astype(float).replace({
         "0": 0, 
         "1-2": 1.5, 
         "3-4": 3.5, 
         "5": 5
-    }).astype(float)
+    })
 
-    # Group by date and desired WFH days to calculate mean efficiency
+def aggregate(df):
+    # Group by date and desired WFH days; keep sums and counts so months can be combined
     grouped = df.groupby(
-        ["date_proper", "wfh_days_numeric"]
-    )["wfh_eff_COVID_quant"].mean().reset_index()
+        [df["date_proper"], wfh_days_numeric(df)]
+    )["wfh_eff_COVID_quant"].agg(["sum", "count"]).reset_index()
+    return {"efficiency": grouped}
+
+def show_chart(df):
+    render(aggregate(df))
+
+def build_figure(tables):
+    efficiency = tables["efficiency"]
+
+    # Mean efficiency by date and desired WFH days
+    grouped = efficiency[["date_proper", "wfh_days_numeric"]].assign(
+        wfh_eff_COVID_quant=efficiency["sum"] / efficiency["count"]
+    )
 
     # Create improved line chart
     fig = px.line(
@@ -83,8 +106,18 @@ def show_chart(df):
         customdata=grouped['wfh_days_numeric']
     )
 
+    return fig
+
+def metrics(tables):
+    # No summary metrics under this chart yet (see the draft below)
+    return []
+
+def render(tables):
     # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
+    fig = cached_figure(__name__, tables, build_figure)
+    with stage("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+    show_metrics(metrics(tables))
 
     # # Calculate and display key metrics
     # latest_date = grouped['date_proper'].max()
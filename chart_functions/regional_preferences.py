@@ -2,17 +2,52 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from data_functions import bootstrap
+from data_functions.counting import count_by
+from chart_functions.metrics import interval_text, metric, show_metrics
+from data_functions.figure_cache import cached_figure
+from data_functions.profiling import stage
 
-def show_chart(df):
-    # Group by region to count preferences and calculate averages
-    region_preferences = df.groupby("region").agg({
-        "wfh_days_postCOVID_ss": ["count", "mean"],  # Count responses and average WFH days
-        "wfh_eff_COVID_quant": "mean"  # Average efficiency
+# Survey columns this chart reads
+COLUMNS = ["region", "wfh_days_postCOVID_ss", "wfh_eff_COVID_quant"]
+
+# Key columns of each aggregate table; everything else is a count or sum that adds up
+TABLE_KEYS = {
+    "totals": ["region"],
+    "days": ["region", "wfh_days_postCOVID_ss"],
+    "efficiency": ["region", "wfh_eff_COVID_quant"]
+}
+
+def aggregate(df):
+    # Group by region to count preferences; keep sums so averages can be combined later
+    totals = df.groupby("region", observed=True).agg({
+        "wfh_days_postCOVID_ss": ["count", "sum"],  # Count responses and total WFH days
+        "wfh_eff_COVID_quant": ["count", "sum"]  # Efficiency responses and total
     }).reset_index()
-    
+
     # Flatten column names
-    region_preferences.columns = ["region", "counts", "avg_wfh_days", "avg_efficiency"]
-    
+    totals.columns = ["region", "counts", "wfh_days_sum", "efficiency_count", "efficiency_sum"]
+
+    # Answers per state and value, for resampling the respondents behind an average
+    days = count_by([df["region"], df["wfh_days_postCOVID_ss"]])
+    efficiency = count_by([df["region"], df["wfh_eff_COVID_quant"]])
+    return {"totals": totals, "days": days, "efficiency": efficiency}
+
+def show_chart(df):
+    render(aggregate(df))
+
+def region_averages(totals):
+    # Calculate averages per region
+    return pd.DataFrame({
+        "region": totals["region"],
+        "counts": totals["counts"],
+        "avg_wfh_days": totals["wfh_days_sum"] / totals["counts"],
+        "avg_efficiency": totals["efficiency_sum"] / totals["efficiency_count"]
+    })
+
+def build_figure(tables):
+    region_preferences = region_averages(tables["totals"])
+
     # Create enhanced choropleth
     fig = px.choropleth(
         region_preferences,
@@ -65,41 +100,62 @@ def show_chart(df):
         colorbar_title_text="Number of<br>Respondents"
     )
 
-    # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+def intervals(tables):
+    # Bootstrap intervals for the averages of the states the metrics name
+    region_preferences = region_averages(tables["totals"])
+    rows = []
+    for label, table, value, average in [
+        ("Highest WFH Preference", "days", "wfh_days_postCOVID_ss", "avg_wfh_days"),
+        ("Most Efficient State", "efficiency", "wfh_eff_COVID_quant", "avg_efficiency"),
+    ]:
+        state = region_preferences.nlargest(1, average)["region"].iloc[0]
+        answers = tables[table][tables[table]["region"] == state]
+        rows.append(bootstrap.intervals(answers["count"], {label: bootstrap.mean(answers[value])}))
+    return pd.concat(rows, ignore_index=True)
+
+def metrics(tables):
+    region_preferences = region_averages(tables["totals"])
 
-    # Calculate and display key metrics
-    col1, col2, col3, col4 = st.columns(4)
-    
     # Sort states by different metrics
     most_responses = region_preferences.nlargest(1, 'counts')
     highest_wfh = region_preferences.nlargest(1, 'avg_wfh_days')
     highest_eff = region_preferences.nlargest(1, 'avg_efficiency')
     
-    with col1:
-        st.metric(
+    return [
+        metric(
             "Most Surveyed State", 
             most_responses['region'].iloc[0],
             f"{most_responses['counts'].iloc[0]:,} responses",
             help="State with the highest number of survey respondents"
-        )
-    with col2:
-        st.metric(
+        ),
+        metric(
             "State Coverage", 
             f"{len(region_preferences)} states",
             help="Number of states with survey responses"
-        )
-    with col3:
-        st.metric(
+        ),
+        metric(
             "Highest WFH Preference", 
             highest_wfh['region'].iloc[0],
             f"{highest_wfh['avg_wfh_days'].iloc[0]:.1f} days",
-            help="State with highest average desired WFH days"
-        )
-    with col4:
-        st.metric(
+            help="State with highest average desired WFH days",
+            interval=interval_text(tables, "Highest WFH Preference", lambda days: f"{days:.2f} days"),
+        ),
+        metric(
             "Most Efficient State", 
             highest_eff['region'].iloc[0],
             f"{highest_eff['avg_efficiency'].iloc[0]:.1%}",
-            help="State with highest reported WFH efficiency"
-        )
\ No newline at end of file
+            help="State with highest reported WFH efficiency",
+            interval=interval_text(tables, "Most Efficient State", lambda efficiency: f"{efficiency:.1%}"),
+        ),
+    ]
+
+def render(tables):
+    # Display the chart
+    fig = cached_figure(__name__, tables, build_figure)
+    with stage("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Calculate and display key metrics
+    show_metrics(metrics(tables))
\ No newline at end of file
@@ -0,0 +1,26 @@
+# chart_functions/registry.py
+import importlib
+
+# ?chart= route -> module in chart_functions
+CHARTS = {
+    "home": "desired_wfh_days",
+    "employer_employee": "employer_vs_employee_wfh",
+    "benefits_challenges": "wfh_benefits_challenges",
+    "productivity": "productivity_trends",
+    "industry": "industry_efficiency",
+    "regional": "regional_preferences",
+    "reactions": "wfo_reactions",
+    "commute": "commute_satisfaction",
+}
+
+# Unknown routes fall back to the home chart
+DEFAULT_ROUTE = "home"
+
+def get_chart(route):
+    # Chart modules (and plotly with them) are only imported the first time their route is requested
+    module_name = CHARTS.get(route, CHARTS[DEFAULT_ROUTE])
+    return importlib.import_module(f"chart_functions.{module_name}")
+
+def all_charts():
+    # Every registered chart keyed by route, for offline tools that need them all
+    return {route: get_chart(route) for route in CHARTS}
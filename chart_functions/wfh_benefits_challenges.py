@@ -2,30 +2,55 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+import numpy as np
+from chart_functions.metrics import metric, show_metrics
+from data_functions.counting import sum_by
+from data_functions.figure_cache import cached_figure
+from data_functions.profiling import stage
+
+# Survey columns this chart reads (date_proper is decoded from date)
+COLUMNS = [
+    "date",
+    "wfh_top3benefits_commute",
+    "wfh_top3benefits_quiet",
+    "wfh_top3benefits_meetings",
+    "lesseff_reasons_internet"
+]
+
+# Key columns of each aggregate table; everything else is a count or sum that adds up
+TABLE_KEYS = {"totals": ["date_proper", "Aspect"]}
+
+# Clean up aspect names for better readability
+ASPECT_NAMES = {
+    "wfh_top3benefits_commute": "No Commute",
+    "wfh_top3benefits_quiet": "Quiet Environment",
+    "wfh_top3benefits_meetings": "Better Meetings",
+    "lesseff_reasons_internet": "Internet Issues"
+}
+
+def aggregate(df):
+    # Total responses per month for every aspect column at once, without melting
+    # the survey into four times as many rows
+    monthly = sum_by([df["date_proper"]], {column: df[column] for column in ASPECT_NAMES})
+
+    # Lay the (months x aspects) totals out long, one row per month and aspect
+    df_benefits = pd.DataFrame({
+        "date_proper": np.tile(monthly["date_proper"].to_numpy(), len(ASPECT_NAMES)),
+        # Categorical in ASPECT_NAMES order, which merged tables keep when they sort by
+        # their keys: legend order and colours follow it
+        "Aspect": pd.Categorical(
+            np.repeat(list(ASPECT_NAMES.values()), len(monthly)), categories=list(ASPECT_NAMES.values())
+        ),
+        "Count": np.concatenate([monthly[column].to_numpy() for column in ASPECT_NAMES]),
+    })
+    return {"totals": df_benefits}
 
 def show_chart(df):
-    # Prepare the data
-    df_benefits = df.melt(
-        id_vars=["date_proper"], 
-        value_vars=[
-            "wfh_top3benefits_commute",
-            "wfh_top3benefits_quiet", 
-            "wfh_top3benefits_meetings",
-            "lesseff_reasons_internet"
-        ],
-        var_name="Aspect",
-        value_name="Count"
-    )
-    
-    # Clean up aspect names for better readability
-    aspect_names = {
-        "wfh_top3benefits_commute": "No Commute",
-        "wfh_top3benefits_quiet": "Quiet Environment",
-        "wfh_top3benefits_meetings": "Better Meetings",
-        "lesseff_reasons_internet": "Internet Issues"
-    }
-    df_benefits['Aspect'] = df_benefits['Aspect'].map(aspect_names)
-    
+    render(aggregate(df))
+
+def build_figure(tables):
+    df_benefits = tables["totals"]
+
     # Create enhanced bar chart
     fig = px.bar(
         df_benefits,
@@ -83,39 +108,45 @@ def show_chart(df):
         tickformat="%b %Y"  # Format as "Jan 2023"
     )
 
-    # Display the chart
-    st.plotly_chart(fig, use_container_width=False)
+    return fig
+
+def metrics(tables):
+    df_benefits = tables["totals"]
 
-    # Calculate and display key metrics
-    col1, col2, col3, col4 = st.columns(4)
-    
     latest_date = df_benefits['date_proper'].max()
     latest_data = df_benefits[df_benefits['date_proper'] == latest_date]
     
-    metrics = {aspect: group['Count'].sum() 
-              for aspect, group in latest_data.groupby('Aspect')}
+    totals = {aspect: group['Count'].sum() 
+              for aspect, group in latest_data.groupby('Aspect', observed=True)}
     
-    with col1:
-        st.metric(
+    return [
+        metric(
             "No Commute Impact", 
-            f"{metrics['No Commute']:,.0f}",
+            f"{totals['No Commute']:,.0f}",
             help="Number of respondents citing commute savings as a benefit"
-        )
-    with col2:
-        st.metric(
+        ),
+        metric(
             "Quiet Environment", 
-            f"{metrics['Quiet Environment']:,.0f}",
+            f"{totals['Quiet Environment']:,.0f}",
             help="Number of respondents valuing quiet work environment"
-        )
-    with col3:
-        st.metric(
+        ),
+        metric(
             "Better Meetings", 
-            f"{metrics['Better Meetings']:,.0f}",
+            f"{totals['Better Meetings']:,.0f}",
             help="Number of respondents reporting improved meeting efficiency"
-        )
-    with col4:
-        st.metric(
+        ),
+        metric(
             "Internet Challenges", 
-            f"{metrics['Internet Issues']:,.0f}",
+            f"{totals['Internet Issues']:,.0f}",
             help="Number of respondents facing internet connectivity issues"
-        )
\ No newline at end of file
+        ),
+    ]
+
+def render(tables):
+    # Display the chart
+    fig = cached_figure(__name__, tables, build_figure)
+    with stage("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=False)
+
+    # Calculate and display key metrics
+    show_metrics(metrics(tables))
\ No newline at end of file
@@ -2,20 +2,45 @@
 import streamlit as st
 import plotly.express as px
 import pandas as pd
+from data_functions import bootstrap
+from data_functions.derived import derived_column
+from chart_functions.metrics import interval_text, metric, show_metrics
+from data_functions.counting import count_by
+from data_functions.figure_cache import cached_figure
+from data_functions.profiling import stage
+from data_functions.schema import RESPONSE_LABELS
 
-def show_chart(df):
-    # Map numeric labels to descriptions
-    response_mapping = {
-        1: "Comply and return",
-        2: "Return & start looking for a WFH job",
-        3: "Quit, regardless of getting another job",
-    }
+# Survey columns this chart reads (date_proper is decoded from date)
+COLUMNS = ["date", "wbp_react_qual"]
+
+# Key columns of each aggregate table; everything else is a count or sum that adds up
+TABLE_KEYS = {"counts": ["date_proper", "wbp_react_qual_desc"]}
+
+# Metric label -> reaction whose share of the latest month it shows
+METRIC_RESPONSES = {
+    "Would Comply": "Comply and return",
+    "Would Look for WFH Job": "Return & start looking for a WFH job",
+    "Would Quit Immediately": "Quit, regardless of getting another job",
+}
 
-    # Convert numeric labels to categorical descriptions
-    df["wbp_react_qual_desc"] = df["wbp_react_qual"].map(response_mapping)
+@derived_column
+def wbp_react_qual_desc(df):
+    # Convert numeric labels to categorical descriptions (relabels the categories only)
+    labels = df["wbp_react_qual"].cat.rename_categories(RESPONSE_LABELS)
+    # In label order, as the string groupby this replaced sorted them: the legend
+    # order and the colour of each reaction depend on it
+    return labels.cat.reorder_categories(sorted(labels.cat.categories))
 
+def aggregate(df):
     # Count occurrences of each response category per month
-    grouped = df.groupby(["date_proper", "wbp_react_qual_desc"]).size().reset_index(name="count")
+    grouped = count_by([df["date_proper"], wbp_react_qual_desc(df)])
+    return {"counts": grouped}
+
+def show_chart(df):
+    render(aggregate(df))
+
+def build_figure(tables):
+    grouped = tables["counts"]
 
     # Create enhanced stacked bar chart
     fig = px.bar(
@@ -72,39 +97,58 @@ def show_chart(df):
         tickformat="%b %Y"  # Format as "Jan 2023"
     )
 
-    # Display the chart
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+def latest_month(tables):
+    grouped = tables["counts"]
+    return grouped[grouped['date_proper'] == grouped['date_proper'].max()]
+
+def intervals(tables):
+    # Bootstrap intervals for the latest month's reaction shares
+    latest_data = latest_month(tables)
+    responses = latest_data['wbp_react_qual_desc'].astype(str).to_numpy()
+    return bootstrap.intervals(latest_data['count'], {
+        label: bootstrap.share(responses == response) for label, response in METRIC_RESPONSES.items()
+    })
 
-    # Calculate and display key metrics
+def metrics(tables):
     # Get latest month's data
-    latest_date = grouped['date_proper'].max()
-    latest_data = grouped[grouped['date_proper'] == latest_date]
+    latest_data = latest_month(tables)
     
     # Calculate total responses and percentages for the latest month
     total_latest = latest_data['count'].sum()
     response_percentages = latest_data.set_index('wbp_react_qual_desc')['count'] / total_latest * 100
+    percent = lambda share: f"{share:.1%}"
     
-    # Display metrics in columns
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.metric(
+    return [
+        metric(
             "Would Comply", 
             f"{response_percentages.get('Comply and return', 0):.1f}%",
-            help="Percentage of employees who would comply with return-to-office mandate"
-        )
-    with col2:
-        st.metric(
+            help="Percentage of employees who would comply with return-to-office mandate",
+            interval=interval_text(tables, "Would Comply", percent),
+        ),
+        metric(
             "Would Look for WFH Job", 
             f"{response_percentages.get('Return & start looking for a WFH job', 0):.1f}%",
-            help="Percentage of employees who would look for a new WFH job"
-        )
-    with col3:
-        st.metric(
+            help="Percentage of employees who would look for a new WFH job",
+            interval=interval_text(tables, "Would Look for WFH Job", percent),
+        ),
+        metric(
             "Would Quit Immediately", 
             f"{response_percentages.get('Quit, regardless of getting another job', 0):.1f}%",
-            help="Percentage of employees who would quit regardless of having another job"
-        )
+            help="Percentage of employees who would quit regardless of having another job",
+            interval=interval_text(tables, "Would Quit Immediately", percent),
+        ),
+    ]
+
+def render(tables):
+    # Display the chart
+    fig = cached_figure(__name__, tables, build_figure)
+    with stage("plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    # Display metrics in columns
+    show_metrics(metrics(tables))
 
     # # Add trend analysis
     # st.markdown("### Trend Analysis")
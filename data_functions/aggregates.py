@@ -0,0 +1,247 @@
+# data_functions/aggregates.py
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_functions import parquet_store, schema
+
+# Bump whenever a chart's aggregate tables change shape so old artifacts get rebuilt
+AGGREGATES_VERSION = 5
+MANIFEST_NAME = "manifest.json"
+
+
+def aggregates_path(zip_path):
+    # The artifact lives next to the zip, e.g. data/WFHdata_October24_minimal.aggregates/
+    return Path(zip_path).with_suffix(".aggregates")
+
+
+def chart_name(chart):
+    # Charts are stored under their module name, e.g. "desired_wfh_days"
+    return chart.__name__.rsplit(".", 1)[-1]
+
+
+def artifact_charts():
+    # Everything stored in the artifact by name: every chart's tables and the
+    # sidebar's filter options
+    from chart_functions import registry
+    from data_functions import filters
+
+    return {chart_name(chart): chart for chart in [*registry.all_charts().values(), filters]}
+
+
+def runtime_enabled():
+    # WFH_DATA_MODE=aggregates renders charts from the prebuilt tables
+    return os.environ.get("WFH_DATA_MODE", "raw") == "aggregates"
+
+
+def chart_frame(df, chart):
+    # The projection of df a chart would get from load_data
+    return df[[c for c in chart.COLUMNS + ["date_proper"] if c in df]]
+
+
+def merge_tables(tables, keys):
+    # Adds up additive aggregate tables (counts and sums) that share the given key columns.
+    # Rows come out sorted by the keys, as a single groupby over all the rows would give
+    # them: chunks and waves arrive in no particular month order, and line charts draw
+    # their points in row order.
+    combined = pd.concat(tables, ignore_index=True)
+    # Categoricals whose categories differ between tables (e.g. regions seen in only
+    # one chunk) come out of concat as object; restore them with the union of categories
+    for column in keys:
+        if combined[column].dtype == object and any(isinstance(t[column].dtype, pd.CategoricalDtype) for t in tables):
+            combined[column] = combined[column].astype("category")
+    if not keys:
+        # agg keeps each column's dtype where sum().to_frame().T would upcast to float
+        return combined.agg(["sum"]).reset_index(drop=True)
+    return combined.groupby(keys, observed=True, dropna=False, sort=True).sum().reset_index()
+
+
+def expand_counts(table, count_column="count"):
+    # Turn a (value, count) table back into one row per respondent
+    return table.loc[table.index.repeat(table[count_column])].drop(columns=count_column)
+
+
+def _sorted_weights(values, weights):
+    values = np.asarray(values, dtype=float)
+    weights = np.asarray(weights)
+    order = np.argsort(values, kind="stable")
+    return values[order], np.cumsum(weights[order])
+
+
+def _value_at(values, cumulative, position):
+    # Value at a 0-based position of the expanded, sorted sample
+    return values[np.searchsorted(cumulative, position, side="right")]
+
+
+def weighted_quantile(values, weights, q):
+    # Quantile of the expanded values using Plotly.js' "linear" box-plot method:
+    # interpolate at position q * N - 0.5 of the sorted sample
+    values, cumulative = _sorted_weights(values, weights)
+    total = cumulative[-1] if len(cumulative) else 0
+    if total == 0:
+        return np.nan
+    position = min(max(q * total - 0.5, 0), total - 1)
+    lower = _value_at(values, cumulative, np.floor(position))
+    upper = _value_at(values, cumulative, np.ceil(position))
+    fraction = position % 1
+    return fraction * upper + (1 - fraction) * lower
+
+
+def weighted_median(values, weights):
+    # Same result as Series.median() on the expanded values
+    return weighted_quantile(values, weights, 0.5)
+
+
+def precomputed_boxes():
+    # WFH_BOX_MODE=raw ships every observation and lets Plotly.js compute the boxes
+    return os.environ.get("WFH_BOX_MODE", "precomputed") != "raw"
+
+
+def box_stats(values, weights, max_outliers=100):
+    # Box-plot statistics matching what Plotly.js computes from the raw sample
+    q1, median, q3 = (weighted_quantile(values, weights, q) for q in (0.25, 0.5, 0.75))
+    total = np.sum(weights)
+    values = np.asarray(values, dtype=float)[np.asarray(weights) > 0]
+    iqr = q3 - q1
+
+    # Whiskers end at the most extreme observations within 1.5 IQR of the box
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    lowerfence = min(q1, inside.min()) if len(inside) else q1
+    upperfence = max(q3, inside.max()) if len(inside) else q3
+
+    # Everything beyond the whiskers is an outlier; repeated values are drawn once
+    outliers = np.unique(values[(values < lowerfence) | (values > upperfence)])
+    if len(outliers) > max_outliers:
+        outliers = outliers[np.linspace(0, len(outliers) - 1, max_outliers).round().astype(int)]
+
+    return {
+        "q1": q1,
+        "median": median,
+        "q3": q3,
+        "lowerfence": lowerfence,
+        "upperfence": upperfence,
+        "notchspan": 1.57 * iqr / np.sqrt(total) if total else 0,
+        "count": total,
+        "outliers": outliers,
+    }
+
+
+def read_manifest(out_dir):
+    try:
+        with open(Path(out_dir) / MANIFEST_NAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_stale(zip_path, out_dir):
+    manifest = read_manifest(out_dir)
+    if manifest is None or manifest.get("version") != AGGREGATES_VERSION:
+        return True
+    current = parquet_store.source_fingerprint(zip_path, manifest.get("source"))
+    if current["sha256"] != manifest["source"].get("sha256"):
+        return True
+
+    # A wave that was already folded in and has since changed or disappeared can't be
+    # subtracted back out, so the artifact has to be rebuilt
+    folded = manifest.get("waves", {})
+    current_waves = {path.name for path in parquet_store.wave_files(zip_path)}
+    return any(name not in current_waves for name in folded) or any(
+        path.name in folded for path, _ in parquet_store.changed_waves(zip_path, folded)
+    )
+
+
+def pending_waves(zip_path, out_dir):
+    # Survey waves in data/ that have not been folded into the artifact yet
+    manifest = read_manifest(out_dir) or {}
+    return parquet_store.changed_waves(zip_path, manifest.get("waves", {}))
+
+
+def write_table(table, path):
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    table.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def aggregate_chunks(charts, chunks):
+    # Every chart's tables over a sequence of survey frames, summed as they arrive so
+    # only one chunk and the (small) running totals are ever in memory
+    totals = {}
+    for chunk in chunks:
+        if "date_proper" not in chunk:
+            chunk["date_proper"] = schema.decode_dates(chunk["date"])
+        for name, chart in charts.items():
+            # Hand each chart its own projection, the way load_data would
+            tables = chart.aggregate(chart_frame(chunk, chart))
+            if name not in totals:
+                totals[name] = tables
+                continue
+            totals[name] = {
+                table_name: merge_tables([totals[name][table_name], table], chart.TABLE_KEYS[table_name])
+                for table_name, table in tables.items()
+            }
+    return totals
+
+
+def build_aggregates(charts, chunks, zip_path, out_dir=None, waves=None):
+    zip_path = Path(zip_path)
+    out_dir = Path(out_dir or aggregates_path(zip_path))
+
+    # Write into a scratch directory first so readers never see a half-built artifact
+    tmp_dir = out_dir.with_name(f"{out_dir.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    tables_by_chart = {}
+    for name, tables in aggregate_chunks(charts, chunks).items():
+        (tmp_dir / name).mkdir()
+        for table_name, table in tables.items():
+            table.to_parquet(tmp_dir / name / f"{table_name}.parquet", index=False)
+        tables_by_chart[name] = sorted(tables)
+
+    manifest = {
+        "version": AGGREGATES_VERSION,
+        "source": {"name": zip_path.name, **parquet_store.source_fingerprint(zip_path)},
+        "charts": tables_by_chart,
+        # Survey waves already included in chunks
+        "waves": waves or {},
+    }
+    with open(tmp_dir / MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+def fold_waves(charts, zip_path, out_dir=None):
+    # Adds new survey waves to an existing artifact. Only the new wave is parsed
+    # and aggregated; its tables are summed into the stored ones, so months that
+    # were already there are left as they are.
+    out_dir = Path(out_dir or aggregates_path(zip_path))
+    for path, fingerprint in pending_waves(zip_path, out_dir):
+        wave = parquet_store.read_wave(path)
+
+        for name, tables in aggregate_chunks(charts, [wave]).items():
+            stored = read_aggregates(out_dir, name)
+            for table_name, table in tables.items():
+                merged = merge_tables([stored[table_name], table], charts[name].TABLE_KEYS[table_name])
+                write_table(merged, out_dir / name / f"{table_name}.parquet")
+
+        manifest = read_manifest(out_dir)
+        manifest.setdefault("waves", {})[path.name] = {**fingerprint, "rows": len(wave)}
+        # The artifact's own manifest name, not the Parquet store's
+        parquet_store.write_manifest(out_dir, manifest, name=MANIFEST_NAME)
+    return out_dir
+
+
+def read_aggregates(out_dir, name):
+    manifest = read_manifest(out_dir)
+    return {
+        table: pd.read_parquet(Path(out_dir) / name / f"{table}.parquet")
+        for table in manifest["charts"][name]
+    }
@@ -0,0 +1,57 @@
+# data_functions/bootstrap.py
+# Percentile bootstrap intervals for metrics computed from count tables. Resampling
+# n respondents with replacement and counting them per cell is a multinomial draw
+# over the cells, so each batch of replicates is one (batch, cells) array from
+# NumPy and the cost does not grow with the number of respondents.
+import os
+
+import numpy as np
+import pandas as pd
+
+REPLICATES = int(os.environ.get("WFH_BOOTSTRAP_REPLICATES", "1000"))
+
+# Replicates drawn per batch, bounding the resampled array to BATCH x cells
+BATCH = 250
+
+LEVEL = 0.95
+
+# Fixed so an interval does not shift between reruns or processes
+SEED = 20200501
+
+
+def share(cells):
+    # Fraction of respondents in the selected cells (a boolean array over the cells)
+    cells = np.asarray(cells, dtype=bool)
+    return lambda sample: sample[:, cells].sum(axis=1) / sample.sum(axis=1)
+
+
+def mean(values):
+    # Average of a per-cell value over respondents who answered (NaN cells left out)
+    values = np.asarray(values, dtype=float)
+    answered = ~np.isnan(values)
+    weights = np.where(answered, values, 0)
+    return lambda sample: sample @ weights / sample[:, answered].sum(axis=1)
+
+
+def intervals(counts, statistics, replicates=REPLICATES, level=LEVEL, seed=SEED):
+    # One row per statistic (label -> vectorized function of a resampled count array)
+    # with the bounds of its central `level` interval over the replicates
+    counts = np.asarray(counts, dtype=np.int64)
+    respondents = counts.sum()
+    rows = []
+    if respondents > 0 and statistics:
+        rng = np.random.default_rng(seed)
+        draws = {label: [] for label in statistics}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for start in range(0, replicates, BATCH):
+                sample = rng.multinomial(respondents, counts / respondents, size=min(BATCH, replicates - start))
+                for label, statistic in statistics.items():
+                    draws[label].append(statistic(sample))
+
+        tail = (1 - level) / 2
+        for label, values in draws.items():
+            values = np.concatenate(values)
+            values = values[np.isfinite(values)]
+            if len(values):
+                rows.append((label, *np.quantile(values, [tail, 1 - tail])))
+    return pd.DataFrame(rows, columns=["label", "low", "high"])
@@ -0,0 +1,97 @@
+# data_functions/counting.py
+# Counts and sums per combination of key columns, computed with one np.bincount
+# over a combined integer key instead of a pandas groupby. Keys are small coded
+# columns (categoricals, day counts, months), so the combined key space is tiny.
+import numpy as np
+import pandas as pd
+
+
+# Whole-number keys spanning fewer values than this are offset into codes directly
+MAX_DIRECT_LEVELS = 1 << 16
+
+
+def _direct_codes(values):
+    # Day counts and similar answers are small whole numbers (NaN when unanswered):
+    # value - min is already a code, which skips the hashing in pd.factorize
+    array = values.to_numpy()
+    if array.dtype.kind not in "iuf" or not len(array):
+        return None
+    missing = np.isnan(array) if array.dtype.kind == "f" else None
+    present = array[~missing] if missing is not None else array
+    if not len(present):
+        return None
+    # As Python numbers and intp codes: in a narrow integer dtype (the int8 day counts)
+    # the span and the offsets would wrap around once they pass the dtype's range
+    low, high = present.min().item(), present.max().item()
+    if high - low >= MAX_DIRECT_LEVELS or (missing is not None and not np.array_equal(present, np.floor(present))):
+        return None
+    codes = array.astype(np.intp) - low if missing is None else np.where(missing, -1, array - low).astype(np.intp)
+    return codes, pd.Index(np.arange(low, high + 1).astype(array.dtype))
+
+
+def _codes(values, dropna):
+    # Integer codes into the key's levels; categoricals already carry theirs
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, levels = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, levels = _direct_codes(values) or pd.factorize(values, sort=True)
+    if not dropna and (codes < 0).any():
+        # Missing values get a level of their own after the observed ones
+        codes = np.where(codes < 0, len(levels), codes)
+        levels = levels.insert(len(levels), np.nan)
+    return codes, levels
+
+
+def _group_index(keys, dropna):
+    # One flat group number per row; rows with a missing key are left out when dropna
+    codes, levels = zip(*(_codes(key, dropna) for key in keys))
+    shape = tuple(len(level) for level in levels)
+
+    # Row-major combination of the codes, same numbering as np.ravel_multi_index
+    flat = np.zeros(len(codes[0]) if codes else 0, dtype=np.intp)
+    for code, size in zip(codes, shape):
+        flat *= size
+        flat += code
+
+    valid = slice(None)
+    if dropna:
+        present = np.logical_and.reduce([code >= 0 for code in codes])
+        if not present.all():
+            valid = present
+            flat = flat[valid]
+    return flat, valid, shape, levels
+
+
+def _key_frame(keys, levels, shape, groups):
+    # Key columns for the given flat group numbers, in sorted key order like groupby
+    positions = np.unravel_index(groups, shape)
+    columns = {}
+    for key, level, position in zip(keys, levels, positions):
+        if isinstance(key.dtype, pd.CategoricalDtype) and len(level) == len(key.cat.categories):
+            columns[key.name] = pd.Categorical.from_codes(position, dtype=key.dtype)
+        else:
+            columns[key.name] = level.take(position)
+    return pd.DataFrame(columns)
+
+
+def count_by(keys, dropna=True, name="count"):
+    # Rows per observed key combination, like groupby(keys, observed=True).size()
+    flat, _, shape, levels = _group_index(keys, dropna)
+    counts = np.bincount(flat, minlength=int(np.prod(shape)))
+    groups = np.flatnonzero(counts)
+    table = _key_frame(keys, levels, shape, groups)
+    table[name] = counts[groups]
+    return table
+
+
+def sum_by(keys, values, dropna=True):
+    # Sum of each column in `values` ({name: Series}) per observed key combination,
+    # like groupby(keys, observed=True).sum(): missing values add nothing
+    flat, valid, shape, levels = _group_index(keys, dropna)
+    size = int(np.prod(shape))
+    groups = np.flatnonzero(np.bincount(flat, minlength=size))
+    table = _key_frame(keys, levels, shape, groups)
+    for name, column in values.items():
+        weights = np.nan_to_num(column.to_numpy(dtype="float64")[valid])
+        table[name] = np.bincount(flat, weights=weights, minlength=size)[groups]
+    return table
@@ -0,0 +1,54 @@
+# data_functions/derived.py
+import functools
+import threading
+import weakref
+
+# Derived columns per dataset: id(df) -> {column name: Series}
+_columns = {}
+_lock = threading.Lock()
+
+
+def _cache_for(df):
+    key = id(df)
+    with _lock:
+        cache = _columns.get(key)
+        if cache is None:
+            cache = _columns[key] = {}
+            # Drop the memoized columns together with the dataset they were computed from
+            weakref.finalize(df, _columns.pop, key, None)
+    return cache
+
+
+def derived_column(func):
+    # Computes a column from the shared dataset once and memoizes it, so charts
+    # never have to add columns to the frame they were handed
+    key = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(df):
+        cache = _cache_for(df)
+        column = cache.get(key)
+        if column is None:
+            column = cache[key] = func(df).rename(func.__name__)
+        return column
+
+    return wrapper
+
+
+def memoized_columns(df):
+    # Snapshot of the derived columns computed so far for df
+    return dict(_columns.get(id(df), {}))
+
+
+def nbytes():
+    # Memory held by the derived columns memoized for every live dataset
+    with _lock:
+        columns = [column for cache in _columns.values() for column in list(cache.values())]
+    return sum(int(column.memory_usage(deep=True)) for column in columns)
+
+
+def clear():
+    # Forget every memoized column; they are recomputed on next use
+    with _lock:
+        for cache in _columns.values():
+            cache.clear()
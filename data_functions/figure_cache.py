@@ -0,0 +1,64 @@
+# data_functions/figure_cache.py
+import hashlib
+import os
+import sys
+import threading
+
+import cachetools
+import numpy as np
+import pandas as pd
+
+from data_functions import profiling
+
+# Finished Plotly figures shared by every session in the process, keyed by
+# (chart id, fingerprint of the chart's aggregate tables)
+_figures = cachetools.LRUCache(maxsize=int(os.environ.get("WFH_FIGURE_CACHE_SIZE", "64")))
+_lock = threading.Lock()
+
+
+def data_fingerprint(tables):
+    # Content hash of a chart's aggregate tables (names, columns, dtypes and values)
+    digest = hashlib.blake2b(digest_size=16)
+    for name in sorted(tables):
+        table = tables[name]
+        digest.update(name.encode())
+        digest.update(repr(list(zip(table.columns, map(str, table.dtypes)))).encode())
+        digest.update(pd.util.hash_pandas_object(table, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def cached_figure(chart_id, tables, build_figure):
+    with profiling.stage("build_figure") as details:
+        key = (chart_id, data_fingerprint(tables))
+        with _lock:
+            fig = _figures.get(key)
+        details["cached"] = fig is not None
+        if fig is None:
+            # Build outside the lock; two sessions racing on a miss just build it twice
+            fig = build_figure(tables)
+            with _lock:
+                _figures[key] = fig
+    return fig
+
+
+def _approx_nbytes(value):
+    # Rough size of a figure's plotly JSON tree: array buffers plus Python objects
+    if isinstance(value, np.ndarray):
+        return value.nbytes + sum(map(_approx_nbytes, value)) if value.dtype == object else value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_approx_nbytes(k) + _approx_nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(map(_approx_nbytes, value))
+    return sys.getsizeof(value)
+
+
+def nbytes():
+    # Approximate memory held by the cached figures
+    with _lock:
+        figures = list(_figures.values())
+    return sum(_approx_nbytes(fig.to_plotly_json()) for fig in figures)
+
+
+def clear():
+    with _lock:
+        _figures.clear()
@@ -0,0 +1,153 @@
+# data_functions/filters.py
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data_functions import aggregates, schema
+from data_functions.counting import count_by
+from data_functions.loader import dataset_fingerprint, load_aggregates, load_data
+
+# Survey columns the sidebar filters read
+COLUMNS = ["region", "work_industry", "date", "commutetime_quant"]
+
+# Filter name -> the categorical it selects on
+FACETS = {
+    "region": lambda df: df["region"],
+    "industry": lambda df: df["work_industry"],
+    "month": lambda df: df["date"],
+    "commute": lambda df: schema.commute_buckets(df["commutetime_quant"]),
+}
+
+
+# Key columns of each aggregate table (one per facet, rows per value) for the prebuilt
+# artifact, so aggregates mode can list the options without reading the survey
+TABLE_KEYS = {facet: ["value"] for facet in FACETS}
+
+
+def aggregate(df):
+    # Respondents per value of every facet
+    return {facet: count_by([column(df).rename("value")]) for facet, column in FACETS.items()}
+
+
+def chronological(months):
+    # Months slide in calendar order, not the string order of "2023m10" < "2023m9"
+    order = np.argsort(schema.decode_dates(pd.Series(months, dtype=object)).to_numpy(), kind="stable")
+    return [months[i] for i in order]
+
+
+def options_from(tables):
+    # Sidebar choices: the values present in each facet's table, in category order
+    options = {}
+    for facet, table in tables.items():
+        values = table.loc[table["count"] > 0, "value"]
+        present = set(values)
+        levels = values.cat.categories if isinstance(values.dtype, pd.CategoricalDtype) else sorted(present)
+        options[facet] = [value for value in levels if value in present]
+    options["month"] = chronological(options["month"])
+    return options
+
+
+def load_options(fingerprint=None):
+    return _load_options(fingerprint or dataset_fingerprint(), aggregates.runtime_enabled())
+
+
+# From the prebuilt artifact in aggregates mode, so unfiltered views never touch the
+# survey rows; otherwise from the same columns the bitmap index is built from
+@st.cache_resource(max_entries=2)
+def _load_options(fingerprint, from_aggregates):
+    tables = load_aggregates("filters", fingerprint) if from_aggregates else None
+    if tables is None:
+        df = load_data(tuple(COLUMNS), fingerprint)
+        if df is None:
+            return None
+        tables = aggregate(df)
+    return options_from(tables)
+
+
+def build_index(df):
+    # One packed bitmap per facet value (bit i set when row i has that value), so a
+    # filter is a few ORs and ANDs over bytes instead of a scan of the columns.
+    # Rows with a missing value are in no bitmap and drop out once that facet is filtered.
+    bitmaps = {}
+    for facet, column in FACETS.items():
+        values = column(df)
+        codes = values.cat.codes.to_numpy()
+        bitmaps[facet] = {
+            value: np.packbits(codes == code) for code, value in enumerate(values.cat.categories)
+        }
+    return {"rows": len(df), "bitmaps": bitmaps}
+
+
+def load_index(fingerprint=None):
+    # Only needed once a filter is selected; unfiltered views never build it
+    return _load_index(fingerprint or dataset_fingerprint())
+
+
+# Built once per process and version of the data from the same Parquet store load_data
+# reads, so its rows line up with every projection load_data returns for that version.
+# Only the current and the previous version are kept.
+@st.cache_resource(max_entries=2)
+def _load_index(fingerprint):
+    df = load_data(tuple(COLUMNS), fingerprint)
+    if df is None:
+        return None
+    return build_index(df)
+
+
+def canonical(options, selection):
+    # Hashable filter state in which equivalent selections compare equal: values in
+    # option order, and facets left empty or with every value selected dropped
+    state = []
+    for facet, values in options.items():
+        chosen = set(selection.get(facet) or ())
+        if chosen and not chosen.issuperset(values):
+            state.append((facet, tuple(value for value in values if value in chosen)))
+    return tuple(state)
+
+
+def row_mask(index, selection):
+    # Boolean row mask for a selection ({facet: [values]}), or None when nothing is filtered
+    mask = None
+    for facet, values in selection.items():
+        if not values:
+            continue
+        bitmaps = index["bitmaps"][facet]
+        facet_mask = np.bitwise_or.reduce([bitmaps[value] for value in values])
+        mask = facet_mask if mask is None else mask & facet_mask
+    if mask is None:
+        return None
+    return np.unpackbits(mask, count=index["rows"]).view(bool)
+
+
+def apply(df, mask):
+    # The shared frame itself when unfiltered, so its memoized derived columns are reused
+    if mask is None or df is None:
+        return df
+    return df[mask]
+
+
+def sidebar(options):
+    # Filter widgets shared by every chart; an empty choice means "all"
+    st.sidebar.header("Filters")
+    selection = {
+        "region": st.sidebar.multiselect("Region", options["region"], key="filter_region"),
+        "industry": st.sidebar.multiselect(
+            "Industry", options["industry"], format_func=lambda code: schema.INDUSTRY_LABELS.get(code, code),
+            key="filter_industry",
+        ),
+        "commute": st.sidebar.multiselect("Commute time", options["commute"], key="filter_commute"),
+    }
+
+    months = options["month"]
+    if len(months) > 1:
+        start, end = st.sidebar.select_slider(
+            "Survey months",
+            options=months,
+            value=(months[0], months[-1]),
+            key="filter_months",
+            format_func=lambda month: pd.Timestamp(month.replace("m", "-")).strftime("%b %Y"),
+        )
+        # The full range is no filter at all
+        if (start, end) != (months[0], months[-1]):
+            selection["month"] = months[months.index(start):months.index(end) + 1]
+    return selection
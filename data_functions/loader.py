@@ -0,0 +1,161 @@
+# data_functions/loader.py
+import contextlib
+import os
+import threading
+import weakref
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+import streamlit as st
+
+from data_functions import aggregates, parquet_store, schema, shared_dataset
+
+# The survey export shipped with the app
+ZIP_PATH = Path(__file__).parent.parent / "data" / "WFHdata_October24_minimal.zip"
+
+# Bounds on the dataset caches: entries kept (one per version and column projection)
+# and seconds before an entry is reloaded; no TTL unless WFH_DATA_CACHE_TTL is set
+CACHE_MAX_ENTRIES = int(os.environ.get("WFH_DATA_CACHE_MAX_ENTRIES", "32"))
+CACHE_TTL = float(os.environ["WFH_DATA_CACHE_TTL"]) if os.environ.get("WFH_DATA_CACHE_TTL") else None
+
+# Sessions must not build or update the on-disk artifacts at the same time, and
+# neither must worker processes or the offline build scripts on the same host: a
+# thread lock inside the process, and an flock on a file next to the zip across processes
+_build_lock = threading.Lock()
+BUILD_LOCK_NAME = ".build.lock"
+_current = {"fingerprint": None}
+
+# Frames handed out by load_data that are still alive, for memory accounting:
+# (fingerprint, columns) -> frame
+_loaded = weakref.WeakValueDictionary()
+
+
+@contextlib.contextmanager
+def building(zip_path=ZIP_PATH):
+    with _build_lock:
+        # fcntl is POSIX-only; elsewhere only the thread lock applies
+        if fcntl is None:
+            yield
+            return
+        with open(Path(zip_path).with_name(BUILD_LOCK_NAME), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def dataset_fingerprint():
+    # Content version of the survey zip and waves (None while the zip is missing)
+    if not ZIP_PATH.exists():
+        return None
+    return parquet_store.dataset_fingerprint(ZIP_PATH)
+
+
+def _evict_old_versions(fingerprint):
+    # The first request for a new version of the data drops the frames and tables of
+    # the old one; sessions still rendering from them keep their references
+    with _build_lock:
+        previous, _current["fingerprint"] = _current["fingerprint"], fingerprint
+    if previous is not None and previous != fingerprint:
+        _load_data.clear()
+        _load_aggregates.clear()
+
+
+def load_data(columns=None, fingerprint=None):
+    # Keyed by the data's content rather than only the arguments, so replacing the zip
+    # or dropping in a wave is picked up on the next rerun without a restart
+    fingerprint = fingerprint or dataset_fingerprint()
+    _evict_old_versions(fingerprint)
+    df = _load_data(fingerprint, columns)
+    if df is not None:
+        _loaded[(fingerprint, columns)] = df
+    return df
+
+
+def loaded_frames():
+    # Live dataset projections by (fingerprint, columns), whether cached or only still
+    # referenced by a session that is rendering from them
+    return dict(_loaded.items())
+
+
+def is_loaded(columns, fingerprint):
+    # Whether load_data would hand back a frame already in memory
+    return (fingerprint, columns) in _loaded
+
+
+def clear_data():
+    # Drop every cached projection; the next load_data reads the store again
+    _load_data.clear()
+
+
+# One shared dataset per process, version and column projection: cache_resource hands
+# every session the same frame instead of a fresh copy per rerun, so callers must treat
+# it as read-only and compute extra columns through data_functions.derived
+@st.cache_resource(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _load_data(fingerprint, columns=None):
+    try:
+        zip_path = ZIP_PATH
+
+        # Check if file exists
+        if not zip_path.exists():
+            st.error(f"Zip file not found at {zip_path}")
+            return None
+
+        # Build the month-partitioned Parquet store once (and again whenever the zip changes)
+        with building():
+            store_dir = parquet_store.ensure_store(zip_path)
+
+        # Map the copy published in shared memory instead of holding one per worker process
+        if shared_dataset.enabled():
+            # date_proper is published alongside date rather than decoded per process
+            if columns is not None and "date" in columns and "date_proper" not in columns:
+                columns = [*columns, "date_proper"]
+            with building():
+                path = shared_dataset.ensure_published(zip_path, store_dir)
+            return shared_dataset.attach(path, columns)
+
+        # Only read the columns the chart asked for; date_proper is decoded from date
+        if columns is not None:
+            columns = [c for c in columns if c != "date_proper"]
+
+        # Read the columnar store instead of re-parsing the CSV
+        memory_map = os.environ.get("WFH_PARQUET_MMAP", "0") == "1"
+        df = parquet_store.read_store(store_dir, columns=columns, memory_map=memory_map)
+
+        # Convert date string to datetime (each distinct month is parsed once)
+        if "date" in df:
+            df["date_proper"] = schema.decode_dates(df["date"])
+        return df
+
+    except Exception as e:
+        st.error(f"Error loading data: {str(e)}")
+        return None
+
+
+def load_aggregates(name, fingerprint=None):
+    fingerprint = fingerprint or dataset_fingerprint()
+    _evict_old_versions(fingerprint)
+    return _load_aggregates(name, fingerprint)
+
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+def _load_aggregates(name, fingerprint):
+    # Prebuilt tables for one chart, or None when the artifact is missing or out of date
+    out_dir = aggregates.aggregates_path(ZIP_PATH)
+    try:
+        if aggregates.is_stale(ZIP_PATH, out_dir):
+            return None
+
+        # New survey waves only need their own rows aggregated and added in
+        if aggregates.pending_waves(ZIP_PATH, out_dir):
+            with building():
+                aggregates.fold_waves(aggregates.artifact_charts(), ZIP_PATH, out_dir)
+        return aggregates.read_aggregates(out_dir, name)
+    except Exception as e:
+        st.warning(f"Could not read prebuilt aggregates: {str(e)}")
+        return None
@@ -0,0 +1,159 @@
+# data_functions/memory.py
+import ctypes
+import gc
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+
+import cachetools
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from data_functions import derived, figure_cache, loader, profiling, result_cache
+
+logger = logging.getLogger("wfh.memory")
+
+# WFH_MEMORY_BUDGET_MB caps the process's resident memory: over it, caches are
+# evicted (cheapest to rebuild first) and, if that is not enough, views that would
+# need new work are refused until memory is back under the budget. Unset means no cap.
+BUDGET_MB = float(os.environ["WFH_MEMORY_BUDGET_MB"]) if os.environ.get("WFH_MEMORY_BUDGET_MB") else None
+
+# Seconds between eviction passes, so reruns pinned over the budget do not repeat them
+EVICTION_INTERVAL = 5.0
+
+# Filtered copies of the dataset made for each session's last computation:
+# session id -> (weak reference to the copy, its size in bytes)
+_session_copies = cachetools.LRUCache(maxsize=256)
+_lock = threading.Lock()
+_last_eviction = {"at": 0.0, "under_budget": True}
+
+
+def _mb(nbytes):
+    return round(nbytes / 2**20, 1)
+
+
+def _frame_nbytes(df):
+    return int(df.memory_usage(deep=True, index=False).sum())
+
+
+def note_session_copy(df):
+    # Records a per-session copy of the rows (a filtered view) against the session
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None or df is None:
+        return
+    with _lock:
+        _session_copies[ctx.session_id] = (weakref.ref(df), _frame_nbytes(df))
+
+
+def _index_nbytes(index):
+    if index is None:
+        return 0
+    return sum(bitmap.nbytes for bitmaps in index["bitmaps"].values() for bitmap in bitmaps.values())
+
+
+def accounting(index=None):
+    # Resident memory attributed to what holds it, in MB; "unattributed" is the rest
+    # of the process (interpreter, libraries, allocator slack, transient work)
+    frames = loader.loaded_frames()
+    with _lock:
+        sessions = {sid: (ref() is not None, nbytes) for sid, (ref, nbytes) in _session_copies.items()}
+    components = {
+        "shared_dataset": sum(map(_frame_nbytes, frames.values())),
+        "session_copies": sum(nbytes for alive, nbytes in sessions.values() if alive),
+        "derived_columns": derived.nbytes(),
+        "filter_index": _index_nbytes(index),
+        "result_tables": result_cache.nbytes(),
+        "cached_figures": figure_cache.nbytes(),
+    }
+    rss = profiling.rss_mb()
+    report = {name: _mb(nbytes) for name, nbytes in components.items()}
+    report["unattributed"] = round(rss - sum(report.values()), 1) if rss is not None else None
+    return {
+        "rss_mb": round(rss, 1) if rss is not None else None,
+        "budget_mb": BUDGET_MB,
+        "components_mb": report,
+        "projections": len(frames),
+        "sessions": {sid: {"live": alive, "copy_mb": _mb(nbytes)} for sid, (alive, nbytes) in sessions.items()},
+    }
+
+
+def _release():
+    # Hand freed memory back to the OS; glibc otherwise keeps it in the heap and
+    # RSS would not show the eviction
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+# Evicted in order until the process is back under budget: finished figures and
+# aggregate tables are quick to rebuild, derived columns cost a pass over the rows,
+# and dropping the dataset itself means reading the store again
+EVICTIONS = [
+    ("cached_figures", figure_cache.clear),
+    ("result_tables", result_cache.clear),
+    ("derived_columns", derived.clear),
+    ("shared_dataset", loader.clear_data),
+]
+
+
+def enforce_budget():
+    # Called at the start of every rerun; True while the process is under budget
+    if BUDGET_MB is None:
+        return True
+    rss = profiling.rss_mb()
+    if rss is None or rss <= BUDGET_MB:
+        return True
+
+    with _lock:
+        if time.monotonic() - _last_eviction["at"] < EVICTION_INTERVAL:
+            return _last_eviction["under_budget"]
+        _last_eviction["at"] = time.monotonic()
+
+    for name, evict in EVICTIONS:
+        evict()
+        _release()
+        before, rss = rss, profiling.rss_mb()
+        logger.warning(json.dumps({
+            "event": "memory_eviction",
+            "evicted": name,
+            "rss_mb_before": round(before, 1),
+            "rss_mb_after": round(rss, 1),
+            "budget_mb": BUDGET_MB,
+        }))
+        if rss <= BUDGET_MB:
+            break
+    with _lock:
+        _last_eviction["under_budget"] = rss <= BUDGET_MB
+    return rss <= BUDGET_MB
+
+
+def admit():
+    # Whether new heavy work (loading a projection, aggregating rows) may start
+    if enforce_budget():
+        return True
+    logger.warning(json.dumps({"event": "memory_refused", "rss_mb": round(profiling.rss_mb(), 1), "budget_mb": BUDGET_MB}))
+    return False
+
+
+def show_accounting(index=None):
+    report = accounting(index)
+    logger.info(json.dumps({"event": "memory_accounting", **report}))
+
+    budget = f" of {BUDGET_MB:.0f} MB budget" if BUDGET_MB is not None else ""
+    with st.expander(f"Memory: {report['rss_mb']} MB resident{budget}"):
+        st.dataframe(
+            pd.DataFrame(list(report["components_mb"].items()), columns=["component", "mb"]),
+            hide_index=True,
+            use_container_width=True,
+        )
+        st.caption(
+            f"{report['projections']} dataset projections loaded; "
+            f"{len(report['sessions'])} sessions with filtered copies"
+        )
+    return report
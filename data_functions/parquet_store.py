@@ -0,0 +1,276 @@
+# data_functions/parquet_store.py
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import zipfile
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from data_functions import schema
+
+# Column the store is partitioned on (survey month, e.g. "2023m9")
+PARTITION_COLUMN = "date"
+MANIFEST_NAME = "_manifest.json"
+# Bump whenever the stored layout or schema changes so existing stores get rebuilt
+STORE_VERSION = 1
+# Bytes of CSV text handed to each parsing thread
+CSV_BLOCK_SIZE = 4 << 20
+# New survey waves dropped next to the zip, e.g. data/WFHdata_wave_2024m10.csv (or .zip)
+WAVE_PATTERN = "WFHdata_wave_*"
+
+
+def store_path(zip_path):
+    # The store lives next to the zip, e.g. data/WFHdata_October24_minimal.parquet/
+    return Path(zip_path).with_suffix(".parquet")
+
+
+def source_fingerprint(zip_path, previous=None):
+    stat = Path(zip_path).stat()
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    # Size and mtime unchanged: trust the previous hash instead of rereading the zip
+    if previous and all(previous.get(k) == v for k, v in fingerprint.items()):
+        fingerprint["sha256"] = previous.get("sha256")
+        return fingerprint
+
+    digest = hashlib.sha256()
+    with open(zip_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+# Last fingerprint seen per source file, so unchanged files are not re-hashed
+_fingerprints = {}
+
+
+def dataset_fingerprint(zip_path):
+    # Content key of the survey zip plus every wave file next to it. Costs a stat()
+    # per file; a file is only hashed again when its size or mtime changed.
+    parts = []
+    for path in [Path(zip_path), *wave_files(zip_path)]:
+        fingerprint = source_fingerprint(path, _fingerprints.get(path))
+        _fingerprints[path] = fingerprint
+        parts.append((path.name, fingerprint["sha256"]))
+    return hashlib.blake2b(json.dumps(parts).encode(), digest_size=8).hexdigest()
+
+
+def read_manifest(store_dir):
+    try:
+        with open(Path(store_dir) / MANIFEST_NAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(store_dir, manifest, name=MANIFEST_NAME):
+    # Replace the manifest atomically so concurrent readers never see a partial file
+    tmp_path = Path(store_dir) / f"{name}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, Path(store_dir) / name)
+
+
+def is_stale(zip_path, store_dir):
+    manifest = read_manifest(store_dir)
+    if manifest is None or manifest.get("version") != STORE_VERSION:
+        return True
+    current = source_fingerprint(zip_path, manifest.get("source"))
+    return current["sha256"] != manifest["source"].get("sha256")
+
+
+def csv_convert_options():
+    return pa_csv.ConvertOptions(column_types=schema.arrow_read_types(), strings_can_be_null=True)
+
+
+def read_csv_stream(stream):
+    # Arrow's CSV reader pulls the stream in blocks and parses them on all cores,
+    # converting each column to the schema's type while reading
+    table = pa_csv.read_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE),
+        convert_options=csv_convert_options(),
+    )
+    # split_blocks skips consolidating columns into 2-D blocks, and self_destruct
+    # frees each Arrow column as soon as pandas has it, so the data is never held twice
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+    return schema.apply_schema(df)
+
+
+def iter_csv_stream(stream, chunk_bytes):
+    # Yields the CSV as a sequence of typed frames, each parsed from about chunk_bytes
+    # of text, so memory stays flat however large the file is. Inferred categories
+    # (months, regions) only cover the values present in each chunk.
+    reader = pa_csv.open_csv(
+        stream,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=chunk_bytes),
+        convert_options=csv_convert_options(),
+    )
+    for batch in reader:
+        yield schema.apply_schema(batch.to_pandas(split_blocks=True, self_destruct=True))
+
+
+@contextlib.contextmanager
+def open_csv_source(path):
+    # Opens a survey CSV, or the first CSV inside a zip, as a binary stream
+    path = Path(path)
+    if path.suffix != ".zip":
+        with open(path, "rb") as csv_file:
+            yield csv_file
+        return
+    with zipfile.ZipFile(path, "r") as zip_ref:
+        # Get the CSV filename (assuming it's the only or first CSV)
+        csv_name = next(name for name in zip_ref.namelist() if name.endswith(".csv"))
+        # Decompressed on the fly as the reader asks for blocks; the whole CSV text is never in memory
+        with zip_ref.open(csv_name) as csv_file:
+            yield csv_file
+
+
+def read_zipped_csv(zip_path):
+    with open_csv_source(zip_path) as csv_file:
+        return read_csv_stream(csv_file)
+
+
+def read_wave(path):
+    # A wave is a CSV export with the same columns as the main survey, zipped or not
+    with open_csv_source(path) as csv_file:
+        return read_csv_stream(csv_file)
+
+
+def iter_csv_chunks(path, chunk_bytes):
+    with open_csv_source(path) as csv_file:
+        yield from iter_csv_stream(csv_file, chunk_bytes)
+
+
+def wave_files(zip_path):
+    data_dir = Path(zip_path).parent
+    return sorted(p for p in data_dir.glob(WAVE_PATTERN) if p.suffix in (".csv", ".zip"))
+
+
+def changed_waves(zip_path, recorded):
+    # Waves whose fingerprint is not in `recorded` (new files, or files that changed since)
+    changed = []
+    for path in wave_files(zip_path):
+        previous = recorded.get(path.name)
+        fingerprint = source_fingerprint(path, previous)
+        if previous is None or fingerprint["sha256"] != previous.get("sha256"):
+            changed.append((path, fingerprint))
+    return changed
+
+
+def write_partitions(table, store_dir, basename_template):
+    ds.write_dataset(
+        table,
+        store_dir,
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([table.schema.field(PARTITION_COLUMN)]), flavor="hive"
+        ),
+        basename_template=basename_template,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+
+
+def ingest_wave(store_dir, path, fingerprint):
+    # Parse one wave and add its rows to the month partitions it covers; other
+    # partitions (and other waves' files) are left untouched
+    store_dir = Path(store_dir)
+    df = read_wave(path)
+
+    # Drop this wave's previous files in case it was replaced by a corrected export
+    remove_wave(store_dir, path.name)
+    write_partitions(
+        pa.Table.from_pandas(df, preserve_index=False), store_dir, f"wave-{path.stem}-{{i}}.parquet"
+    )
+
+    manifest = read_manifest(store_dir)
+    manifest.setdefault("waves", {})[path.name] = {**fingerprint, "rows": len(df)}
+    write_manifest(store_dir, manifest)
+    return df
+
+
+def remove_wave(store_dir, name):
+    store_dir = Path(store_dir)
+    for old_file in store_dir.glob(f"*/wave-{Path(name).stem}-*.parquet"):
+        old_file.unlink()
+        # A month that only this wave covered leaves an empty partition behind
+        if not any(old_file.parent.iterdir()):
+            old_file.parent.rmdir()
+    manifest = read_manifest(store_dir)
+    manifest.get("waves", {}).pop(name, None)
+    write_manifest(store_dir, manifest)
+
+
+def build_store(zip_path, store_dir=None):
+    zip_path = Path(zip_path)
+    store_dir = Path(store_dir or store_path(zip_path))
+
+    df = read_zipped_csv(zip_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Write into a scratch directory first so readers never see a half-built store
+    tmp_dir = store_dir.with_name(f"{store_dir.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    write_partitions(table, tmp_dir, "part-{i}.parquet")
+
+    manifest = {
+        "version": STORE_VERSION,
+        "source": {"name": zip_path.name, **source_fingerprint(zip_path)},
+        "rows": table.num_rows,
+        "columns": table.column_names,
+    }
+    with open(tmp_dir / MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(store_dir, ignore_errors=True)
+    os.replace(tmp_dir, store_dir)
+    return store_dir
+
+
+def ensure_store(zip_path, store_dir=None):
+    store_dir = Path(store_dir or store_path(zip_path))
+    if is_stale(zip_path, store_dir):
+        build_store(zip_path, store_dir)
+
+    # Fold in any survey waves dropped into data/ since the last call
+    recorded = read_manifest(store_dir).get("waves", {})
+    for path, fingerprint in changed_waves(zip_path, recorded):
+        ingest_wave(store_dir, path, fingerprint)
+
+    # And forget waves whose files were removed
+    current = {path.name for path in wave_files(zip_path)}
+    for name in set(recorded) - current:
+        remove_wave(store_dir, name)
+    return store_dir
+
+
+def read_store(store_dir, columns=None, months=None, memory_map=False):
+    # Month filters are resolved against the partition directories, so
+    # partitions outside the requested months are never opened
+    filters = [(PARTITION_COLUMN, "in", list(months))] if months else None
+    table = pq.read_table(
+        store_dir,
+        columns=columns,
+        filters=filters,
+        memory_map=memory_map,
+        partitioning=ds.partitioning(flavor="hive", dictionaries="infer"),
+    )
+    return schema.apply_schema(table.to_pandas())
+
+
+if __name__ == "__main__":
+    import sys
+
+    from data_functions.loader import building
+
+    zip_path = sys.argv[1] if len(sys.argv) > 1 else Path(__file__).parent.parent / "data" / "WFHdata_October24_minimal.zip"
+    with building(zip_path):
+        print(f"Built {build_store(zip_path)}")
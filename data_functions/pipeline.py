@@ -0,0 +1,96 @@
+# data_functions/pipeline.py
+import numpy as np
+import streamlit as st
+
+from data_functions import aggregates, filters, memory, profiling, result_cache, sampling
+from data_functions.loader import dataset_fingerprint, is_loaded, load_aggregates, load_data
+
+
+def compute_tables(chart, fingerprint, mask=None):
+    # Render from the prebuilt aggregate tables when enabled, otherwise from the survey rows.
+    # The prebuilt tables cover the full sample only, so filtered views use the rows.
+    if aggregates.runtime_enabled() and mask is None:
+        with profiling.stage("load_aggregates"):
+            tables = load_aggregates(aggregates.chart_name(chart), fingerprint)
+        if tables is not None:
+            return tables
+
+    # Over the memory budget even after evicting caches, refuse rather than risk the
+    # whole process; the view is computed on a later rerun once memory is back
+    if not memory.admit():
+        st.warning("The server is short on memory right now, so this view was not computed. Please try again shortly.")
+        return None
+
+    # Load only the columns the selected chart needs
+    with profiling.stage("load_data"):
+        df = load_data(tuple(chart.COLUMNS), fingerprint)
+    if df is None:
+        return None
+    with profiling.stage("aggregate"):
+        rows = filters.apply(df, mask)
+        if rows is not df:
+            memory.note_session_copy(rows)
+        return chart.aggregate(rows)
+
+
+def add_intervals(chart, tables):
+    # Bootstrap intervals for the chart's headline metrics, computed with its tables so
+    # they are cached with them per version of the data and filter state
+    if tables is None or not hasattr(chart, "intervals"):
+        return tables
+    with profiling.stage("bootstrap"):
+        return {**tables, "intervals": chart.intervals(tables)}
+
+
+def chart_tables(chart, filter_state=(), mask=None, fingerprint=None):
+    # Popular slices are aggregated once per process and version of the data, and
+    # shared by every session
+    fingerprint = fingerprint or dataset_fingerprint()
+    return result_cache.cached_tables(
+        aggregates.chart_name(chart), fingerprint, filter_state,
+        lambda: add_intervals(chart, compute_tables(chart, fingerprint, mask)),
+    )
+
+
+def compute_sample_tables(chart, fingerprint, mask=None):
+    # The chart's tables over the stratified sample of the selected rows, scaled up
+    # to the size of the selection; only the sample file is read, never the survey
+    sample = sampling.load_sample(tuple(chart.COLUMNS), fingerprint)
+    rows, df = sample["rows"], sample["frame"]
+    selected = sample["total"]
+    if mask is not None:
+        keep = mask[rows]
+        rows, df = rows[keep], df[keep]
+        selected = np.count_nonzero(mask)
+    if not len(rows):
+        return None
+    tables = chart.aggregate(df)
+    return sampling.scale_tables(tables, chart.TABLE_KEYS, selected / len(rows))
+
+
+def needs_refinement(chart, filter_state=(), mask=None, fingerprint=None):
+    # Progressive rendering only pays off when the exact tables are slow to get: not
+    # cached, not prebuilt, and either the chart's columns still have to be read or the
+    # selection is large. The sample itself must already be on disk.
+    if not sampling.progressive_enabled():
+        return False
+    if aggregates.runtime_enabled() and mask is None:
+        return False
+    fingerprint = fingerprint or dataset_fingerprint()
+    if result_cache.contains(aggregates.chart_name(chart), fingerprint, filter_state):
+        return False
+    if not sampling.sample_ready(fingerprint):
+        return False
+    if not is_loaded(tuple(chart.COLUMNS), fingerprint):
+        return True
+    selected = np.count_nonzero(mask) if mask is not None else len(load_data(tuple(chart.COLUMNS), fingerprint))
+    return selected >= sampling.MIN_EXACT_ROWS
+
+
+def sample_tables(chart, filter_state=(), mask=None, fingerprint=None):
+    # Approximate tables for the first paint, cached next to the exact ones
+    fingerprint = fingerprint or dataset_fingerprint()
+    return result_cache.cached_tables(
+        aggregates.chart_name(chart) + ":sample", fingerprint, filter_state,
+        lambda: compute_sample_tables(chart, fingerprint, mask),
+    )
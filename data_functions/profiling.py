@@ -0,0 +1,128 @@
+# data_functions/profiling.py
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+
+import pandas as pd
+import streamlit as st
+
+logger = logging.getLogger("wfh.profile")
+
+# The profile of the rerun running on this thread; Streamlit runs each session's
+# script on its own thread, so concurrent sessions keep separate profiles
+_local = threading.local()
+
+# Measurements recorded for every stage, in display order
+STAGE_FIELDS = ["seconds", "allocated_mb", "peak_mb", "rss_mb", "cached"]
+
+# Threads with a profile running; tracemalloc slows every allocation in the process,
+# so it only runs while one of them is alive and only if profiling turned it on
+_profiling = weakref.WeakSet()
+_tracing = threading.Lock()
+_started_tracing = False
+
+
+def requested():
+    # Opt in per page view with ?profile=1
+    return st.query_params.get("profile") == "1"
+
+
+def rss_mb():
+    # Current resident set size; /proc is Linux-only, elsewhere this is left out
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def start(**context):
+    # tracemalloc counts Python and NumPy allocations; it is process-wide, so
+    # sessions rerunning at the same moment show up in each other's numbers
+    global _started_tracing
+    with _tracing:
+        _profiling.add(threading.current_thread())
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+    _local.profile = {"context": context, "stages": [], "open": [], "started": time.perf_counter()}
+    return _local.profile
+
+
+@contextlib.contextmanager
+def stage(name, **details):
+    # Times and measures the block when a profile is running on this thread, else does nothing
+    profile = getattr(_local, "profile", None)
+    if profile is None:
+        yield details
+        return
+
+    record = {"stage": name, "depth": len(profile["open"])}
+    profile["stages"].append(record)
+    # Peaks seen by nested stages, which reset tracemalloc's peak for themselves
+    peaks = [0]
+    profile["open"].append(peaks)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        yield details
+    finally:
+        seconds = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, *peaks)
+        profile["open"].pop()
+        if profile["open"]:
+            profile["open"][-1].append(peak)
+        rss = rss_mb()
+        record.update(
+            seconds=round(seconds, 4),
+            allocated_mb=round((current - allocated) / 2**20, 2),
+            peak_mb=round((peak - allocated) / 2**20, 2),
+            rss_mb=round(rss, 1) if rss is not None else None,
+            **details,
+        )
+
+
+def _stop_tracing():
+    # Called by every rerun: a profiled rerun that was interrupted before finish()
+    # leaves its thread in _profiling, which no longer counts once it has exited
+    global _started_tracing
+    with _tracing:
+        _profiling.discard(threading.current_thread())
+        if _started_tracing and not any(thread.is_alive() for thread in _profiling):
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def finish(**context):
+    profile = getattr(_local, "profile", None)
+    _local.profile = None
+    _stop_tracing()
+    if profile is None:
+        return None
+    profile["context"].update(context)
+    profile["total_seconds"] = round(time.perf_counter() - profile["started"], 4)
+
+    # One JSON object per profiled rerun, for log search and dashboards
+    logger.info(json.dumps({
+        "event": "rerun_profile",
+        **profile["context"],
+        "total_seconds": profile["total_seconds"],
+        "stages": profile["stages"],
+    }, default=str))
+
+    with st.expander(f"Profile: {profile['total_seconds']:.3f}s"):
+        table = pd.DataFrame(profile["stages"], columns=["stage", "depth"] + STAGE_FIELDS)
+        # Indent nested stages under the one that contains them
+        table["stage"] = [
+            "    " * (depth - 1) + "↳ " * (depth > 0) + name
+            for depth, name in zip(table.pop("depth"), table["stage"])
+        ]
+        st.dataframe(table, hide_index=True, use_container_width=True)
+    return profile
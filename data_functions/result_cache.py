@@ -0,0 +1,59 @@
+# data_functions/result_cache.py
+import os
+import threading
+
+import cachetools
+
+# Per-chart aggregate tables shared by every session in the process, keyed by
+# (chart id, dataset fingerprint, canonical filter state). Metrics are computed from
+# these tables in render, so a hit skips every groupby in chart_functions.
+# WFH_RESULT_CACHE_TTL (seconds) also expires entries by age.
+_maxsize = int(os.environ.get("WFH_RESULT_CACHE_SIZE", "256"))
+_ttl = os.environ.get("WFH_RESULT_CACHE_TTL")
+_results = cachetools.TTLCache(_maxsize, float(_ttl)) if _ttl else cachetools.LRUCache(_maxsize)
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+_current = {"fingerprint": None}
+
+
+def cached_tables(chart_id, fingerprint, filter_state, compute):
+    key = (chart_id, fingerprint, filter_state)
+    with _lock:
+        # Tables of an older version of the data are never asked for again
+        if fingerprint != _current["fingerprint"]:
+            for stale in [k for k in _results if k[1] != fingerprint]:
+                del _results[stale]
+            _current["fingerprint"] = fingerprint
+        tables = _results.get(key)
+        _stats["hits" if tables is not None else "misses"] += 1
+    if tables is None:
+        # Compute outside the lock; two sessions racing on a miss just compute it twice
+        tables = compute()
+        if tables is not None:
+            with _lock:
+                _results[key] = tables
+    return tables
+
+
+def contains(chart_id, fingerprint, filter_state):
+    # Whether cached_tables would be a hit, without counting it or refreshing the entry
+    with _lock:
+        return (chart_id, fingerprint, filter_state) in _results
+
+
+def stats():
+    with _lock:
+        return {**_stats, "size": len(_results), "maxsize": _results.maxsize}
+
+
+def nbytes():
+    # Memory held by the cached tables (a table shared by two entries counts once)
+    with _lock:
+        tables = {id(t): t for entry in _results.values() for t in entry.values()}
+    return sum(int(t.memory_usage(deep=True).sum()) for t in tables.values())
+
+
+def clear():
+    with _lock:
+        _results.clear()
+        _stats.update(hits=0, misses=0)
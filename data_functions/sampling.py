@@ -0,0 +1,129 @@
+# data_functions/sampling.py
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from data_functions import loader, parquet_store, schema
+
+# WFH_PROGRESSIVE=1 paints a view from a stratified sample first, when its exact
+# tables would be slow to get, and replaces it with the exact chart once they are ready
+SAMPLE_FRACTION = float(os.environ.get("WFH_SAMPLE_FRACTION", "0.05"))
+
+# The sample is the same on every process and restart for a given version of the data
+SAMPLE_SEED = 20200501
+
+# Selections with at least this many rows take long enough to aggregate that the
+# sample is painted first even when the chart's columns are already in memory
+MIN_EXACT_ROWS = int(os.environ.get("WFH_PROGRESSIVE_MIN_ROWS", "2000000"))
+
+
+def progressive_enabled():
+    return os.environ.get("WFH_PROGRESSIVE", "0") == "1"
+
+
+def stratified_rows(columns, fraction=SAMPLE_FRACTION, seed=SAMPLE_SEED):
+    # Sorted row positions of a proportional sample within every (month, region)
+    # stratum. Fractional quotas are rounded at random rather than up, so every row
+    # has the same chance of being drawn and one scale factor fits the whole sample.
+    rng = np.random.default_rng(seed)
+    strata = np.zeros(len(columns[0]), dtype=np.int64)
+    for column in columns:
+        strata *= len(column.cat.categories) + 1
+        strata += column.cat.codes.to_numpy() + 1
+
+    # Rows grouped by stratum in a random order within each; keep the first k of each
+    order = np.lexsort((rng.random(len(strata)), strata))
+    grouped = strata[order]
+    starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+    sizes = np.diff(np.r_[starts, len(grouped)])
+    quota = sizes * fraction
+    keep = (np.floor(quota) + (rng.random(len(quota)) < quota % 1)).astype(np.int64)
+    rank = np.arange(len(grouped)) - np.repeat(starts, sizes)
+    return np.sort(order[rank < np.repeat(keep, sizes)])
+
+
+def sample_path(zip_path, fingerprint):
+    # Stored next to the Parquet store, e.g. data/WFHdata_October24_minimal.sample-<fingerprint>.parquet
+    zip_path = Path(zip_path)
+    return zip_path.with_name(f"{zip_path.stem}.sample-{fingerprint}.parquet")
+
+
+def build_sample(zip_path, fingerprint):
+    # Every column of the sampled rows as one small file, so the first paint of any
+    # chart reads a few thousand rows instead of its full projection. Columns are read
+    # one at a time, so building it never holds the whole survey.
+    with loader.building():
+        store_dir = parquet_store.ensure_store(zip_path)
+    strata = parquet_store.read_store(store_dir, columns=["date", "region"])
+    rows = stratified_rows([strata["date"], strata["region"]])
+    sample = pd.DataFrame({"_row": rows})
+    for column in parquet_store.read_manifest(store_dir)["columns"]:
+        sample[column] = parquet_store.read_store(store_dir, columns=[column])[column].take(rows).to_numpy()
+
+    # Row count of the whole survey, to scale sample counts up by
+    table = pa.Table.from_pandas(sample, preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, b"wfh_rows": str(len(strata)).encode()})
+
+    path = sample_path(zip_path, fingerprint)
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+    # Samples of older versions of the data are never read again
+    for old in path.parent.glob(f"{Path(zip_path).stem}.sample-*.parquet"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+
+def sample_ready(fingerprint):
+    return sample_path(loader.ZIP_PATH, fingerprint).exists()
+
+
+def ensure_sample(fingerprint):
+    # Built once per version of the data; the warm-up does it in the background
+    if not sample_ready(fingerprint):
+        build_sample(loader.ZIP_PATH, fingerprint)
+
+
+def load_sample(columns, fingerprint):
+    return _load_sample(columns, fingerprint)
+
+
+# The sampled rows of one projection: their positions in the survey (which line up
+# with the filter bitmaps), the rows themselves, and the survey's row count
+@st.cache_resource(max_entries=loader.CACHE_MAX_ENTRIES)
+def _load_sample(columns, fingerprint):
+    path = sample_path(loader.ZIP_PATH, fingerprint)
+    read = [c for c in columns if c != "date_proper"]
+    if "date_proper" in columns and "date" not in read:
+        read.append("date")
+    table = pq.read_table(path, columns=["_row", *read])
+    df = schema.apply_schema(table.to_pandas())
+    if "date" in df:
+        df["date_proper"] = schema.decode_dates(df["date"])
+    return {
+        "rows": df.pop("_row").to_numpy(),
+        "frame": df,
+        "total": int(table.schema.metadata[b"wfh_rows"]),
+    }
+
+
+def scale_tables(tables, keys, factor):
+    # Sample counts and sums stand for factor times as many responses; key columns
+    # and the ratios between the rest (shares, averages) are unchanged
+    scaled = {}
+    for name, table in tables.items():
+        table = table.copy()
+        for column in table.columns.difference(keys[name], sort=False):
+            values = table[column] * factor
+            if pd.api.types.is_integer_dtype(table[column].dtype):
+                values = values.round().astype(table[column].dtype)
+            table[column] = values
+        scaled[name] = table
+    return scaled
@@ -0,0 +1,121 @@
+# data_functions/schema.py
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Industry codes used by the survey
+INDUSTRY_LABELS = {
+    1: "Agriculture",
+    2: "Arts & Entertainment",
+    3: "Finance & Insurance",
+    4: "Construction",
+    5: "Education",
+    6: "Health Care & Social Assistance",
+    7: "Hospitality & Food Services",
+    8: "Information",
+    9: "Manufacturing",
+    10: "Mining",
+    11: "Professional & Business Services",
+    12: "Real Estate",
+    13: "Retail Trade",
+    14: "Transportation and Warehousing",
+    15: "Utilities",
+    16: "Wholesale Trade",
+    17: "Government",
+    18: "Other"
+}
+
+# Reaction codes for a return-to-office mandate
+RESPONSE_LABELS = {
+    1: "Comply and return",
+    2: "Return & start looking for a WFH job",
+    3: "Quit, regardless of getting another job",
+}
+
+# Commute-time buckets shared by the commute chart and the sidebar filter
+COMMUTE_BINS = [0, 30, 60, 120]  # Define ranges for small, medium, and large commute times
+COMMUTE_LABELS = ["Small (0-30 min)", "Medium (31-60 min)", "Large (61+ min)"]
+
+# Coded answers stored as dictionary-encoded categoricals
+CATEGORICAL_COLUMNS = {
+    "date": None,  # categories inferred from the data, e.g. "2023m9"
+    "region": None,
+    "work_industry": list(INDUSTRY_LABELS),
+    "wbp_react_qual": list(RESPONSE_LABELS),
+    "wfh_days_postCOVID_s": list(range(1, 8)),
+}
+
+# Bounded numerics. Days are small integers, the benefit flags are 0/100 and
+# commute times come in half minutes, so float32 holds them exactly.
+# wfh_eff_COVID_quant and wfh_feel_quant keep float64: their codes (-12.7,
+# -10.000002, ...) are not representable in float32 and show up in hover labels.
+NUMERIC_COLUMNS = {
+    "wfh_days_postCOVID_ss": "int8",
+    "wfh_days_postCOVID_boss_ss": "float32",
+    "wfh_top3benefits_commute": "float32",
+    "wfh_top3benefits_quiet": "float32",
+    "wfh_top3benefits_meetings": "float32",
+    "lesseff_reasons_internet": "float32",
+    "wfh_eff_COVID_quant": "float64",
+    "commutetime_quant": "float32",
+    "wfh_feel_quant": "float64",
+}
+
+# dtypes handed to the CSV parser; coded categoricals are parsed as numbers
+# first and converted by apply_schema so "1.0" and "1" land in the same category
+READ_DTYPES = {
+    "date": "category",
+    "region": "category",
+    "work_industry": "float32",
+    "wbp_react_qual": "float32",
+    "wfh_days_postCOVID_s": "int8",
+    **NUMERIC_COLUMNS,
+}
+
+
+def arrow_read_types():
+    # READ_DTYPES for Arrow's CSV reader; categories arrive dictionary-encoded
+    return {
+        column: pa.dictionary(pa.int32(), pa.string()) if dtype == "category" else pa.from_numpy_dtype(np.dtype(dtype))
+        for column, dtype in READ_DTYPES.items()
+    }
+
+
+def apply_schema(df):
+    for column, dtype in NUMERIC_COLUMNS.items():
+        if column in df and df[column].dtype != dtype:
+            df[column] = df[column].astype(dtype)
+
+    for column, categories in CATEGORICAL_COLUMNS.items():
+        if column not in df:
+            continue
+        if categories is None:
+            # Keep inferred categories sorted so groupby output order matches
+            # the plain object columns this replaces
+            values = df[column].astype("category")
+            categories = sorted(values.cat.categories)
+            if list(values.cat.categories) != categories:
+                values = values.cat.reorder_categories(categories)
+            if values is not df[column]:
+                df[column] = values
+        elif not isinstance(df[column].dtype, pd.CategoricalDtype) or list(df[column].cat.categories) != categories:
+            df[column] = pd.Categorical(df[column], categories=categories)
+    return df
+
+
+def decode_dates(dates):
+    # Survey months look like "2023m9"; parse each distinct value once and
+    # broadcast the result back through the category codes
+    dates = dates.astype("category")
+    parsed = pd.to_datetime(
+        dates.cat.categories.astype(str).str.replace("m", "-"), format="%Y-%m"
+    )
+    return pd.Series(
+        parsed.take(dates.cat.codes.to_numpy(), allow_fill=True, fill_value=pd.NaT),
+        index=dates.index,
+        name="date_proper",
+    )
+
+
+def commute_buckets(minutes):
+    return pd.cut(minutes, bins=COMMUTE_BINS, labels=COMMUTE_LABELS, right=False)
@@ -0,0 +1,88 @@
+# data_functions/shared_dataset.py
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from data_functions import parquet_store, schema
+
+# Bump whenever the file layout below changes
+SHARED_VERSION = 1
+# A RAM-backed directory every worker process on the host can map
+SHARED_DIR = Path(os.environ.get("WFH_SHARED_DIR", "/dev/shm"))
+# datetime64 columns are stored as their int64 nanoseconds
+DATETIME_COLUMNS = ["date_proper"]
+
+
+def enabled():
+    # WFH_SHARED_MEMORY=1 makes every worker map one published copy of the survey
+    return os.environ.get("WFH_SHARED_MEMORY", "0") == "1"
+
+
+def shared_path(zip_path, store_dir):
+    # Named after the store's content, so a rebuilt store or a new wave gets a new file
+    manifest = parquet_store.read_manifest(store_dir)
+    key = json.dumps(
+        [SHARED_VERSION, manifest["version"], manifest["source"]["sha256"],
+         sorted((name, wave["sha256"]) for name, wave in manifest.get("waves", {}).items())]
+    )
+    digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    return SHARED_DIR / f"{Path(zip_path).stem}-{digest}.arrow"
+
+
+def publish(store_dir, path):
+    # Every column is written as a plain, null-free array (categoricals as their codes,
+    # missing floats as NaN) so attach can hand numpy views of the mapping to pandas
+    df = parquet_store.read_store(store_dir)
+    df["date_proper"] = schema.decode_dates(df["date"])
+
+    arrays = {}
+    categories = {}
+    for column, values in df.items():
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories[column] = values.cat.categories.tolist()
+            values = values.cat.codes
+        values = values.to_numpy()
+        if column in DATETIME_COLUMNS:
+            values = values.view("int64")
+        arrays[column] = pa.array(values)
+    table = pa.table(arrays).replace_schema_metadata({"categories": json.dumps(categories)})
+
+    # Write next to the final name and rename, so workers only ever map a complete file
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp_path, path)
+
+    # Older versions can go; workers still mapping them keep their pages until they let go
+    for old in path.parent.glob(f"{path.name.rsplit('-', 1)[0]}-*.arrow"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+
+def ensure_published(zip_path, store_dir):
+    path = shared_path(zip_path, store_dir)
+    if not path.exists():
+        publish(store_dir, path)
+    return path
+
+
+def attach(path, columns=None):
+    # Zero-copy: the columns are read-only numpy views of one mapping of the file, and
+    # the kernel shares its pages between every process that attaches to it
+    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    categories = json.loads(table.schema.metadata[b"categories"])
+
+    data = {}
+    for column in columns or table.column_names:
+        values = table.column(column).chunk(0).to_numpy(zero_copy_only=True)
+        if column in categories:
+            values = pd.Categorical.from_codes(values, categories=categories[column], validate=False)
+        elif column in DATETIME_COLUMNS:
+            values = values.view("datetime64[ns]")
+        data[column] = values
+    return pd.DataFrame(data, copy=False)
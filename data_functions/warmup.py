@@ -0,0 +1,101 @@
+# data_functions/warmup.py
+import logging
+import os
+import threading
+
+from data_functions import aggregates, filters, pipeline, sampling
+from data_functions.loader import dataset_fingerprint, load_aggregates, load_data
+
+logger = logging.getLogger("wfh.warmup")
+
+# WFH_WARMUP=data (the default) prepares the dataset: the Parquet store and the
+# filter options. =figures also loads every chart's columns and prebuilds its
+# unfiltered tables and figure, which holds all of them in memory on every process;
+# =off leaves everything to the first request
+MODES = ("off", "data", "figures")
+
+THREAD_NAME = "wfh-warmup"
+
+_ready = threading.Event()
+_lock = threading.Lock()
+_thread = None
+
+
+def mode():
+    value = os.environ.get("WFH_WARMUP", "data")
+    return value if value in MODES else "data"
+
+
+def warm(charts):
+    # The slow part of a cold start: unzip, parse and convert the survey to Parquet
+    # (done by the first load_data) and list the filter options every page needs
+    fingerprint = dataset_fingerprint()
+    from_aggregates = aggregates.runtime_enabled()
+    filters.load_options(fingerprint)
+    if from_aggregates:
+        # Unfiltered views render from the prebuilt tables, so the raw survey stays
+        # on disk until someone filters; read the tables instead
+        for chart in charts:
+            load_aggregates(aggregates.chart_name(chart), fingerprint)
+    _ready.set()
+    logger.info("survey data ready")
+
+    # The progressive first paint reads the stratified sample, written once per version
+    if sampling.progressive_enabled() and not from_aggregates:
+        sampling.ensure_sample(fingerprint)
+
+    if mode() == "figures":
+        from data_functions.figure_cache import cached_figure
+
+        # Not waited for: each page loads its own columns quickly once the store
+        # exists, and finds them already cached if the warm-up got there first
+        if not from_aggregates:
+            for chart in charts:
+                load_data(tuple(chart.COLUMNS), fingerprint)
+        for chart in charts:
+            tables = pipeline.chart_tables(chart, fingerprint=fingerprint)
+            if tables is not None:
+                cached_figure(chart.__name__, tables, chart.build_figure)
+        logger.info("chart figures ready")
+
+
+def _quiet_context_warnings():
+    # Cached loaders log "missing ScriptRunContext" when called outside a page
+    # view; that is expected on this thread, so drop those records
+    context_logger = logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context")
+    context_logger.addFilter(lambda record: threading.current_thread().name != THREAD_NAME)
+
+
+def _run():
+    from chart_functions import registry
+
+    _quiet_context_warnings()
+    try:
+        warm(registry.all_charts().values())
+    except Exception:
+        # Requests fall back to loading the data themselves and report the error
+        logger.exception("warm-up failed")
+    finally:
+        _ready.set()
+
+
+def start():
+    # Starts the warm-up thread once per process; later calls are no-ops
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        if mode() == "off":
+            _thread = False
+            _ready.set()
+            return
+        _thread = threading.Thread(target=_run, name=THREAD_NAME, daemon=True)
+        _thread.start()
+
+
+def ready():
+    return _ready.is_set()
+
+
+def wait(timeout=None):
+    return _ready.wait(timeout)
@@ -0,0 +1,160 @@
+# export_static.py
+# Pre-renders every ?chart= route to static files for read-only embeds:
+#   python export_static.py [--output static]
+# writes <route>.html (the chart and its metrics, Plotly.js inlined), <route>.json
+# (the figure, loadable with plotly.io.read_json), metrics.json and an index.html.
+# Map outlines are not part of Plotly.js, which would fetch them from cdn.plot.ly when
+# a page is viewed: pages with a map (regional.html) inline them instead, from Plotly's
+# topojson files in data/topojson/ (or --topojson DIR). The export stops before writing
+# anything if a file it needs is missing, e.g. https://cdn.plot.ly/usa_110m.json.
+import argparse
+import html
+import json
+from pathlib import Path
+
+from data_functions import aggregates, parquet_store, pipeline, schema
+from data_functions.loader import ZIP_PATH, building
+from chart_functions import registry
+
+# Plotly's topojson files, shipped next to the survey zip
+TOPOJSON_DIR = ZIP_PATH.with_name("topojson")
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 1rem 2rem; }}
+.metrics {{ display: flex; gap: 1rem; }}
+.metric {{ flex: 1; }}
+.metric .label {{ font-size: 0.9rem; color: #555; }}
+.metric .value {{ font-size: 2rem; }}
+.metric .delta {{ font-size: 0.9rem; color: #09ab3b; }}
+.metric .delta.down {{ color: #ff2b2b; }}
+.metric .interval {{ font-size: 0.8rem; color: #777; }}
+</style>
+</head>
+<body>
+{figure}
+<div class="metrics">
+{metrics}
+</div>
+</body>
+</html>
+"""
+
+METRIC = """<div class="metric" title="{help}">
+<div class="label">{label}</div>
+<div class="value">{value}</div>
+<div class="delta{direction}">{delta}</div>
+<div class="interval">{interval}</div>
+</div>"""
+
+
+def metrics_html(metrics):
+    # Same colouring as st.metric: negative deltas in red
+    return "\n".join(
+        METRIC.format(
+            direction=" down" if str(item["delta"] or "").startswith("-") else "",
+            **{key: html.escape(str(value or "")) for key, value in item.items()},
+        )
+        for item in metrics
+    )
+
+
+def topojson_names(fig):
+    # The files Plotly.js would fetch for the figure's maps, named <scope>_<resolution>m
+    geos = [fig.layout[trace.geo] for trace in fig.data if "geo" in trace]
+    return sorted({f"{(geo.scope or 'world').replace(' ', '-')}_{geo.resolution or 110}m" for geo in geos})
+
+
+def missing_topojson(topojson_dir, names):
+    paths = (Path(topojson_dir) / f"{name}.json" for name in names)
+    return [path for path in paths if not path.exists()]
+
+
+def topojson_html(topojson_dir, names):
+    # Preloaded outlines, which Plotly.js uses instead of fetching them
+    assets = {name: json.loads((Path(topojson_dir) / f"{name}.json").read_text(encoding="utf-8")) for name in names}
+    return f"<script>window.PlotlyGeoAssets = {{topojson: {json.dumps(assets)}}};</script>\n"
+
+
+def index_html(routes):
+    links = "\n".join(f'<li><a href="{route}.html">{route}</a></li>' for route in routes)
+    return PAGE.format(title="WFH survey charts", figure=f"<ul>\n{links}\n</ul>", metrics="")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render every chart route to static HTML and JSON")
+    parser.add_argument("--output", default="static", help="directory to write the files to")
+    parser.add_argument(
+        "--plotlyjs",
+        choices=["inline", "directory"],
+        default="inline",
+        help="inline Plotly.js in every page, or write plotly.min.js once next to them",
+    )
+    parser.add_argument(
+        "--topojson",
+        default=TOPOJSON_DIR,
+        help="directory with Plotly's topojson files (e.g. usa_110m.json), inlined in pages with a map",
+    )
+    args = parser.parse_args()
+
+    # Every chart's tables from one read of the store, the same way build_aggregates does
+    # Locked like the app's own builds, so a running server cannot swap the store mid-read
+    with building():
+        store_dir = parquet_store.ensure_store(ZIP_PATH)
+        df = parquet_store.read_store(store_dir)
+    df["date_proper"] = schema.decode_dates(df["date"])
+    charts = {route: registry.get_chart(route) for route in registry.CHARTS}
+    tables_by_chart = aggregates.aggregate_chunks(
+        {aggregates.chart_name(chart): chart for chart in charts.values()}, [df]
+    )
+
+    figures, all_metrics = {}, {}
+    for route, chart in charts.items():
+        tables = pipeline.add_intervals(chart, tables_by_chart[aggregates.chart_name(chart)])
+        figures[route] = chart.build_figure(tables)
+        all_metrics[route] = chart.metrics(tables)
+
+    # Every page must render offline, so a missing map outline is an error rather than a CDN fetch
+    missing = missing_topojson(args.topojson, sorted({name for fig in figures.values() for name in topojson_names(fig)}))
+    if missing:
+        parser.error(
+            "map outlines not found: " + ", ".join(map(str, missing))
+            + f"; download them from https://cdn.plot.ly/ into {args.topojson} or pass --topojson DIR"
+        )
+
+    out_dir = Path(args.output)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for route, fig in figures.items():
+        metrics = all_metrics[route]
+        fig.write_json(out_dir / f"{route}.json")
+        figure = fig.to_html(
+            full_html=False,
+            include_plotlyjs=True if args.plotlyjs == "inline" else "plotly.min.js",
+            default_width="100%",
+        )
+        geo_files = topojson_names(fig)
+        if geo_files:
+            figure = topojson_html(args.topojson, geo_files) + figure
+        title = fig.layout.title.text or route
+        (out_dir / f"{route}.html").write_text(
+            PAGE.format(title=html.escape(title), figure=figure, metrics=metrics_html(metrics)),
+            encoding="utf-8",
+        )
+        print(f"Wrote {out_dir / route}.html")
+
+    if args.plotlyjs == "directory":
+        from plotly.offline import get_plotlyjs
+
+        (out_dir / "plotly.min.js").write_text(get_plotlyjs(), encoding="utf-8")
+
+    with open(out_dir / "metrics.json", "w") as f:
+        json.dump(all_metrics, f, indent=2)
+    (out_dir / "index.html").write_text(index_html(charts), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
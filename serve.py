@@ -0,0 +1,15 @@
+# serve.py
+# Starts the Streamlit server with the survey data warming up on a background
+# thread from the moment the process boots, instead of on the first page view:
+#   python serve.py [streamlit options]
+import sys
+from pathlib import Path
+
+from streamlit.web import cli as stcli
+
+from data_functions import warmup
+
+if __name__ == "__main__":
+    warmup.start()
+    sys.argv = ["streamlit", "run", str(Path(__file__).parent / "app.py"), *sys.argv[1:]]
+    sys.exit(stcli.main())
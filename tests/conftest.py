@@ -0,0 +1,29 @@
+# tests/conftest.py
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SURVEY_ZIP = ROOT / "data" / "WFHdata_October24_minimal.zip"
+
+
+def survey_lines(count):
+    # Header plus the first `count` responses of the shipped survey export
+    with zipfile.ZipFile(SURVEY_ZIP) as zip_ref:
+        with zip_ref.open(zip_ref.namelist()[0]) as f:
+            return [f.readline() for _ in range(count + 1)]
+
+
+@pytest.fixture
+def small_survey(tmp_path):
+    # A 2,000-response survey zip in a scratch data directory, plus the next 500
+    # responses as text for a wave file
+    lines = survey_lines(2500)
+    zip_path = tmp_path / "WFHdata_test.zip"
+    with zipfile.ZipFile(zip_path, "w") as zip_ref:
+        zip_ref.writestr("WFHdata_test.csv", b"".join(lines[:2001]))
+    return zip_path, lines[0] + b"".join(lines[2001:])
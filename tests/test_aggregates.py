@@ -0,0 +1,58 @@
+# tests/test_aggregates.py
+import pandas as pd
+
+from chart_functions import desired_wfh_days
+from data_functions import aggregates, parquet_store
+
+
+def test_folded_wave_is_counted_once(small_survey):
+    zip_path, wave_csv = small_survey
+    charts = {aggregates.chart_name(desired_wfh_days): desired_wfh_days}
+    name = aggregates.chart_name(desired_wfh_days)
+    out_dir = aggregates.build_aggregates(charts, [parquet_store.read_zipped_csv(zip_path)], zip_path)
+
+    (zip_path.parent / "WFHdata_wave_2024m12.csv").write_bytes(wave_csv)
+    assert len(aggregates.pending_waves(zip_path, out_dir)) == 1
+
+    # A second fold (new cache key, restart, another build) must find nothing to add
+    aggregates.fold_waves(charts, zip_path, out_dir)
+    aggregates.fold_waves(charts, zip_path, out_dir)
+
+    assert aggregates.pending_waves(zip_path, out_dir) == []
+    assert not aggregates.is_stale(zip_path, out_dir)
+    counts = aggregates.read_aggregates(out_dir, name)["counts"]
+    assert counts["count"].sum() == 2500
+
+
+def _legend(fig):
+    # What the viewer sees of the trace order: names and colours, in drawing order
+    traces = [trace.to_plotly_json() for trace in fig.data]
+    return [
+        (trace.get("name"), str(trace.get("marker", {}).get("color")), str(trace.get("line", {}).get("color")))
+        for trace in traces
+    ]
+
+
+def test_chunked_build_matches_single_pass(small_survey):
+    zip_path, _ = small_survey
+    charts = aggregates.artifact_charts()
+
+    # Chunks of a few KB, so months recur across chunks in file order
+    chunked_by_chart = aggregates.aggregate_chunks(charts, parquet_store.iter_csv_chunks(zip_path, 16 << 10))
+    single_by_chart = aggregates.aggregate_chunks(charts, [parquet_store.read_zipped_csv(zip_path)])
+
+    for name, chart in charts.items():
+        chunked, single = chunked_by_chart[name], single_by_chart[name]
+        assert chunked.keys() == single.keys(), name
+        for table, keys in chart.TABLE_KEYS.items():
+            if "date_proper" in keys:
+                assert chunked[table]["date_proper"].is_monotonic_increasing, (name, table)
+            pd.testing.assert_frame_equal(
+                chunked[table].sort_values(keys, ignore_index=True),
+                single[table].sort_values(keys, ignore_index=True),
+                check_dtype=False,
+                check_categorical=False,
+                obj=f"{name}.{table}",
+            )
+        if hasattr(chart, "build_figure"):
+            assert _legend(chart.build_figure(chunked)) == _legend(chart.build_figure(single)), name
@@ -0,0 +1,29 @@
+# tests/test_bootstrap.py
+import numpy as np
+import pandas as pd
+
+from data_functions import bootstrap
+
+COUNTS = [120, 45, 35]
+
+
+def test_intervals_are_reproducible_for_a_fixed_seed():
+    statistics = {"first": bootstrap.share([True, False, False])}
+    first = bootstrap.intervals(COUNTS, statistics, replicates=400)
+    pd.testing.assert_frame_equal(first, bootstrap.intervals(COUNTS, statistics, replicates=400))
+    assert not first.equals(bootstrap.intervals(COUNTS, statistics, replicates=400, seed=1))
+
+
+def test_intervals_cover_the_point_estimate():
+    values = np.array([1.0, 2.0, np.nan])
+    statistics = {"share": bootstrap.share([True, False, False]), "mean": bootstrap.mean(values)}
+    intervals = bootstrap.intervals(COUNTS, statistics, replicates=400).set_index("label")
+
+    share = COUNTS[0] / sum(COUNTS)
+    mean = (1.0 * COUNTS[0] + 2.0 * COUNTS[1]) / (COUNTS[0] + COUNTS[1])
+    assert intervals.loc["share", "low"] < share < intervals.loc["share", "high"]
+    assert intervals.loc["mean", "low"] < mean < intervals.loc["mean", "high"]
+
+
+def test_no_respondents_means_no_intervals():
+    assert bootstrap.intervals([0, 0], {"share": bootstrap.share([True, False])}).empty
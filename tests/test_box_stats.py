@@ -0,0 +1,36 @@
+# tests/test_box_stats.py
+import numpy as np
+import pytest
+
+from data_functions.aggregates import box_stats
+
+# 1, 2, 2, 3, 4, 5, 6, 30 as counts per value
+VALUES = [1, 2, 3, 4, 5, 6, 30]
+WEIGHTS = [1, 2, 1, 1, 1, 1, 1]
+
+
+def test_box_stats_match_plotly_linear_method():
+    stats = box_stats(VALUES, WEIGHTS)
+
+    # Plotly.js "linear" quartiles interpolate at q * N - 0.5 of the sorted sample
+    assert (stats["q1"], stats["median"], stats["q3"]) == (2, 3.5, 5.5)
+    # Whiskers stop at the last observations within 1.5 IQR of the box
+    assert (stats["lowerfence"], stats["upperfence"]) == (1, 6)
+    assert stats["outliers"].tolist() == [30]
+    assert stats["notchspan"] == pytest.approx(1.57 * 3.5 / np.sqrt(8))
+    assert stats["count"] == 8
+
+
+def test_box_stats_match_expanded_sample():
+    rng = np.random.default_rng(0)
+    values = np.arange(-20, 21)
+    weights = rng.integers(0, 50, len(values))
+    expanded = np.repeat(values, weights)
+    stats = box_stats(values, weights)
+
+    q1, median, q3 = np.quantile(expanded, [0.25, 0.5, 0.75], method="hazen")
+    assert (stats["q1"], stats["median"], stats["q3"]) == pytest.approx((q1, median, q3))
+    assert stats["median"] == np.median(expanded)
+    iqr = q3 - q1
+    inside = expanded[(expanded >= q1 - 1.5 * iqr) & (expanded <= q3 + 1.5 * iqr)]
+    assert (stats["lowerfence"], stats["upperfence"]) == (inside.min(), inside.max())
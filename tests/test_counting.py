@@ -0,0 +1,13 @@
+# tests/test_counting.py
+import numpy as np
+import pandas as pd
+
+from data_functions import counting
+
+
+def test_int8_key_spanning_more_than_127_values():
+    values = pd.Series(np.array([-100, 0, 100, 100], dtype=np.int8), name="days")
+    counts = counting.count_by([values])
+    expected = values.value_counts().sort_index()
+    assert counts["days"].tolist() == expected.index.tolist()
+    assert counts["count"].tolist() == expected.tolist()
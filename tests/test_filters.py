@@ -0,0 +1,39 @@
+# tests/test_filters.py
+import numpy as np
+
+from data_functions import filters, parquet_store, schema
+
+
+def test_bitmap_mask_matches_boolean_mask(small_survey):
+    zip_path, _ = small_survey
+    df = parquet_store.read_zipped_csv(zip_path)
+    index = filters.build_index(df)
+    commute = schema.commute_buckets(df["commutetime_quant"])
+    months = filters.chronological(list(df["date"].dropna().unique()))
+    regions = df["region"].value_counts().index[:2].tolist()
+
+    selections = [
+        {"region": regions},
+        {"month": months[3:9]},
+        {"commute": [schema.COMMUTE_LABELS[0], schema.COMMUTE_LABELS[2]]},
+        {"region": regions, "month": months[3:9], "commute": [schema.COMMUTE_LABELS[0]]},
+    ]
+    for selection in selections:
+        expected = np.ones(len(df), dtype=bool)
+        for facet, values in selection.items():
+            column = commute if facet == "commute" else df[{"region": "region", "month": "date"}[facet]]
+            expected &= column.isin(values).to_numpy()
+        mask = filters.row_mask(index, selection)
+        assert mask.sum() == expected.sum(), selection
+        assert np.array_equal(mask, expected), selection
+
+
+def test_unfiltered_selection_has_no_mask(small_survey):
+    zip_path, _ = small_survey
+    df = parquet_store.read_zipped_csv(zip_path)
+    options = filters.options_from(filters.aggregate(df))
+
+    # Nothing chosen and everything chosen are the same state, and neither needs a mask
+    assert filters.canonical(options, {"region": []}) == ()
+    assert filters.canonical(options, {"region": options["region"]}) == ()
+    assert filters.row_mask(filters.build_index(df), {"region": []}) is None
@@ -0,0 +1,26 @@
+# tests/test_sampling.py
+import numpy as np
+import pandas as pd
+
+from data_functions import parquet_store, sampling
+
+
+def test_stratified_rows_are_proportional_per_stratum(small_survey):
+    zip_path, _ = small_survey
+    df = parquet_store.read_zipped_csv(zip_path)
+    strata = [df["date"], df["region"]]
+    rows = sampling.stratified_rows(strata, fraction=0.1)
+
+    assert np.array_equal(rows, np.unique(rows))
+    assert np.array_equal(rows, sampling.stratified_rows(strata, fraction=0.1))
+
+    # Each stratum keeps its quota rounded down or up
+    sizes = df.groupby(["date", "region"], observed=True, dropna=False).size()
+    kept = df.iloc[rows].groupby(["date", "region"], observed=True, dropna=False).size()
+    kept = kept.reindex(sizes.index, fill_value=0)
+    assert ((kept >= np.floor(sizes * 0.1)) & (kept <= np.ceil(sizes * 0.1))).all()
+
+
+def test_full_fraction_keeps_every_row():
+    column = pd.Series(["a", "b", None, "a"], dtype="category")
+    assert sampling.stratified_rows([column], fraction=1.0).tolist() == [0, 1, 2, 3]